@@ -0,0 +1,183 @@
+# Trains 2025 - benchmarks
+# By Tomasz Golaszewski
+# 05.2025 -
+
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+from sys import path
+
+# run without window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+# add files to path
+path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import pygame
+
+from settings import *
+from classes_map import *
+from classes_simulation import Simulation
+
+
+def generate_map(size: int, number_of_lines: int) -> Map:
+    """Generate map with size x size tiles and railway lines laid by random walks
+    (lines crossing each other create switches)."""
+    map = Map()
+    for x_id in range(size):
+        for y_id in range(size):
+            map.add_tile((x_id, y_id), "grass")
+    for _ in range(number_of_lines):
+        coord_id = (random.randrange(size), random.randrange(size))
+        direction = random.randrange(6)
+        for _ in range(random.randint(size // 2, 2 * size)):
+            next_coord_id = map.get_neighbor_coord_id(coord_id, direction)
+            tile_id, next_tile_id = map.get_tile_by_coord_id(coord_id), map.get_tile_by_coord_id(next_coord_id)
+            if not next_tile_id: break
+            map.add_track(tile_id, next_tile_id)
+            coord_id = next_coord_id
+            if random.random() < 0.1: direction += random.choice([-1, 1])
+    return map
+
+
+def measure(function, repeats: int) -> dict:
+    """Run the function several times.
+    Return the median and the minimum of the time of one run (in seconds)."""
+    list_with_times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        list_with_times.append(time.perf_counter() - start_time)
+    return {"seconds": statistics.median(list_with_times), "min_seconds": min(list_with_times), "repeats": repeats}
+
+
+def get_route_queries(map: Map, number_of_queries: int) -> list[tuple[int, int, int]]:
+    """Return queries (target, last tile, current tile) with targets lying ahead of the trains."""
+    list_with_tiles = [tile_id for tile_id in map.dict_with_tiles if len(map.dict_with_tiles[tile_id].list_with_tracks)]
+    list_with_queries = []
+    for _ in range(number_of_queries):
+        current_tile_id = random.choice(list_with_tiles)
+        last_tile_id = random.choice(map.dict_with_tiles[current_tile_id].list_with_tracks)
+        target_tile_id, tile_id = last_tile_id, current_tile_id
+        for _ in range(random.randint(5, 60)):
+            list_with_next_tiles = [next_tile_id for next_tile_id in map.get_next_tiles(target_tile_id, tile_id) if next_tile_id]
+            if not len(list_with_next_tiles): break
+            target_tile_id, tile_id = tile_id, random.choice(list_with_next_tiles)
+        list_with_queries.append((tile_id, last_tile_id, current_tile_id))
+    return list_with_queries
+
+
+def run_benchmarks(size: int, number_of_trains: int, repeats: int) -> dict:
+    """Run all benchmarks on the generated map and fleet.
+    Return results: benchmark name -> timing."""
+    dict_with_results = {}
+    map = generate_map(size, size // 2)
+    simulation = Simulation(map)
+    simulation.add_random_trains(number_of_trains)
+    win = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+    offset_x, offset_y, scale = 0, 0, 0.25
+
+    # routing
+    list_with_queries = get_route_queries(map, 200)
+    def find_routes():
+        for target_tile_id, last_tile_id, current_tile_id in list_with_queries:
+            map.find_route(target_tile_id, last_tile_id, current_tile_id)
+    def find_shortest_routes():
+        for target_tile_id, last_tile_id, current_tile_id in list_with_queries:
+            map.find_shortest_route(target_tile_id, last_tile_id, current_tile_id)
+    dict_with_results["find_route"] = measure(find_routes, repeats) | {"operations": len(list_with_queries)}
+    dict_with_results["find_shortest_route"] = measure(find_shortest_routes, repeats) | {"operations": len(list_with_queries)}
+
+    # paths and reservations
+    def calculate_all_paths():
+        for train_id in simulation.dict_with_trains:
+            simulation.dict_with_trains[train_id].path_outdated = True
+        map.calculate_trains_path(simulation.dict_with_trains)
+    dict_with_results["calculate_trains_path"] = measure(calculate_all_paths, repeats) | {"operations": number_of_trains}
+    dict_with_results["calculate_trains_path_incremental"] = measure(lambda: map.calculate_trains_path(simulation.dict_with_trains), repeats) | {"operations": number_of_trains}
+
+    # trains
+    def run_trains():
+        for _ in range(TICKRATE):
+            for train_id in simulation.dict_with_trains:
+                simulation.dict_with_trains[train_id].run(map, simulation.dict_with_trains)
+    dict_with_results["train_run"] = measure(run_trains, repeats) | {"operations": TICKRATE * number_of_trains}
+
+    # rendering
+    def draw_map_cold():
+        map.layer.clear()
+        map.draw(win, offset_x, offset_y, scale)
+    dict_with_results["map_draw_cold"] = measure(draw_map_cold, repeats) | {"operations": 1}
+    dict_with_results["map_draw"] = measure(lambda: map.draw(win, offset_x, offset_y, scale), repeats) | {"operations": 1}
+    dict_with_results["draw_grid"] = measure(lambda: map.draw_grid(win, offset_x, offset_y, scale), repeats) | {"operations": 1}
+
+    # lookups
+    list_with_coords = [(random.randrange(-10, size + 10), random.randrange(-10, size + 10)) for _ in range(10000)]
+    def get_tiles():
+        for coord_id in list_with_coords:
+            map.get_tile_by_coord_id(coord_id)
+    dict_with_results["get_tile_by_coord_id"] = measure(get_tiles, repeats) | {"operations": len(list_with_coords)}
+
+    for name in dict_with_results:
+        dict_with_results[name]["seconds_per_operation"] = dict_with_results[name]["seconds"] / dict_with_results[name]["operations"]
+    return dict_with_results
+
+
+def compare_results(dict_with_results: dict, dict_with_baseline: dict, tolerance: float) -> list[str]:
+    """Print comparison with the baseline.
+    Return names of benchmarks slower than the baseline by more than the tolerance."""
+    list_with_regressions = []
+    print(f"{'BENCHMARK':<50}{'BASELINE':>12}{'CURRENT':>12}{'RATIO':>8}")
+    for name in dict_with_results:
+        if name not in dict_with_baseline: continue
+        baseline = dict_with_baseline[name]["seconds_per_operation"]
+        current = dict_with_results[name]["seconds_per_operation"]
+        ratio = current / baseline if baseline else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            list_with_regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<50}{baseline * 1e6:>10.2f}us{current * 1e6:>10.2f}us{ratio:>8.2f}{flag}")
+    return list_with_regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run benchmarks of routing, paths, trains and rendering.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[40, 80, 160], help="sizes (in tiles) of the square maps")
+    parser.add_argument("--trains", type=int, default=50, help="number of trains")
+    parser.add_argument("--repeats", type=int, default=7, help="number of runs of each benchmark")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the random generator")
+    parser.add_argument("--output", default=None, help="write results to the JSON file")
+    parser.add_argument("--baseline", default=None, help="compare results with the JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    pygame.init()
+    dict_with_results = {}
+    for size in args.sizes:
+        random.seed(args.seed)
+        for name, result in run_benchmarks(size, args.trains, args.repeats).items():
+            dict_with_results[f"{name}@{size}"] = result
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump({
+                "parameters": vars(args),
+                "environment": {"python": platform.python_version(), "pygame": pygame.version.ver, "platform": platform.platform()},
+                "results": dict_with_results,
+            }, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            list_with_regressions = compare_results(dict_with_results, json.load(file)["results"], args.tolerance)
+        sys.exit(1 if list_with_regressions else 0)
+    else:
+        print(f"{'BENCHMARK':<50}{'TIME':>12}{'PER OPERATION':>16}")
+        for name, result in dict_with_results.items():
+            print(f"{name:<50}{result['seconds'] * 1e3:>10.2f}ms{result['seconds_per_operation'] * 1e6:>14.2f}us")
@@ -0,0 +1,58 @@
+# Trains 2025 - headless simulation
+# By Tomasz Golaszewski
+# 05.2025 -
+
+
+import os
+import argparse
+import random
+from sys import path
+
+# add files to path
+path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from classes_simulation import Simulation
+from classes_replay import Replay
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the simulation without display and rendering.")
+    parser.add_argument("--ticks", type=int, default=3600, help="number of simulation ticks")
+    parser.add_argument("--trains", type=int, default=10, help="number of trains placed on random tracks")
+    parser.add_argument("--targets", type=int, default=2, help="number of targets of each train")
+    parser.add_argument("--fleet", action="store_true", help="move trains with the vectorized fleet (NumPy)")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random generator")
+    parser.add_argument("--map", default=None, help="binary map file loaded instead of the default map")
+    parser.add_argument("--save-map", default=None, help="save the map to the binary map file after the run")
+    parser.add_argument("--record", default=None, help="write commands and state checksums to the command log")
+    parser.add_argument("--replay", default=None, help="replay the command log (other options are ignored)")
+    parser.add_argument("--chunk-storage", default=None, help="directory for chunks of the map unloaded to disk")
+    parser.add_argument("--max-loaded-chunks", type=int, default=256, help="max number of chunks kept in memory")
+    parser.add_argument("--route-workers", type=int, default=0, help="number of processes searching routes of trains (0 - main process)")
+    args = parser.parse_args()
+
+    if args.replay is not None:
+        stats = Replay(args.replay).run()
+        print(f"TICKS: {stats['ticks']}\tTIME: {stats['seconds']:.3f}s\tTICKS/S: {stats['ticks_per_second']:.1f}")
+        print(f"COMMANDS: {stats['commands']}\tCHECKSUMS: {stats['checksums']}\tDIVERGENT TICKS: {stats['divergent_ticks']}")
+        raise SystemExit(1 if stats["divergent_ticks"] else 0)
+
+    random.seed(args.seed)
+    simulation = Simulation(use_fleet=args.fleet)
+    if args.map is not None:
+        simulation.map.load(args.map)
+    if args.chunk_storage is not None:
+        simulation.map.enable_chunk_storage(args.chunk_storage, args.max_loaded_chunks)
+    if args.route_workers:
+        simulation.map.enable_route_pool(args.route_workers)
+    if args.record is not None:
+        simulation.start_command_log(args.record)
+    simulation.add_random_trains(args.trains, args.targets)
+    stats = simulation.run(args.ticks)
+    simulation.stop_command_log()
+    simulation.map.disable_route_pool()
+    if args.save_map is not None:
+        simulation.map.save(args.save_map)
+
+    print(f"TICKS: {stats['ticks']}\tTIME: {stats['seconds']:.3f}s\tTICKS/S: {stats['ticks_per_second']:.1f}")
+    print(f"TILES: {stats['tiles']}\tTRAINS: {stats['trains']}\tSTATES: {stats['states']}")
@@ -0,0 +1,48 @@
+import json
+
+
+COMMAND_LOG_VERSION = 1
+
+
+class CommandLog:
+    def __init__(self, path: str):
+        """Initialization of the append-only log of commands changing the world.
+        Each line of the file is a JSON object: the header first, then commands and state checksums
+        with the numbers of ticks in which they appeared.
+        The log written before to the same path is replaced (one log holds one session)."""
+        self.path = path
+        self.file = open(path, "w")
+
+    def write_header(self, header: dict):
+        """Write the header with parameters of the simulation."""
+        self.write_line({"version": COMMAND_LOG_VERSION} | header)
+
+    def write_command(self, tick: int, command: str, args: tuple):
+        """Write the command."""
+        self.write_line({"tick": tick, "command": command, "args": list(args)})
+
+    def write_checksum(self, tick: int, checksum: str):
+        """Write the checksum of the state of the simulation."""
+        self.write_line({"tick": tick, "checksum": checksum})
+
+    def write_line(self, entry: dict):
+        """Write the entry as one line - the line is flushed immediately, so the log survives crashes."""
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+
+    def close(self):
+        """Close the file."""
+        self.file.close()
+
+
+def read_command_log(path: str) -> tuple[dict, list[dict]]:
+    """Read the command log.
+    Return the header and the list of entries (lists in arguments of commands are changed into tuples)."""
+    with open(path) as file:
+        list_with_entries = [json.loads(line) for line in file if line.strip()]
+    if not list_with_entries or list_with_entries[0].get("version") != COMMAND_LOG_VERSION:
+        raise ValueError(f"unsupported command log: {path}")
+    for entry in list_with_entries[1:]:
+        if "args" in entry:
+            entry["args"] = [tuple(arg) if isinstance(arg, list) else arg for arg in entry["args"]]
+    return list_with_entries[0], list_with_entries[1:]
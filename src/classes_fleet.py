@@ -0,0 +1,171 @@
+import heapq
+import numpy as np
+
+from game_engine.functions_math_batch import *
+
+
+class Fleet:
+    def __init__(self, capacity: int = 64):
+        """Initialization of the fleet.
+        The fleet keeps movement parameters of all trains in contiguous arrays
+        and moves all trains in one vectorized step. Train objects are used only
+        for the discrete events: change of the tile, achieved target, new paths.
+        Trains are kept in the order of the dictionary of trains, so events are handled in the same order as by Train.run."""
+        self.list_with_train_ids = [] # index in arrays -> train_id
+        self.dict_with_indices = {} # train_id -> index in arrays
+        self.paths_version = -1 # version of the trains paths used to set steering targets
+        self.topology_version = -1 # version of the tracks used to find tiles of the trains
+        self.events_outdated = True # all trains have to be checked in the next tick (e.g. after a command)
+
+        self.coord_world = np.zeros((capacity, 2))
+        self.last_coord_world = np.zeros((capacity, 2))
+        self.angle = np.zeros(capacity)
+        self.v_current = np.zeros(capacity)
+        self.v_target = np.zeros(capacity)
+        self.acceleration = np.zeros(capacity)
+        self.turn_speed = np.zeros(capacity)
+        self.target_coord_world = np.zeros((capacity, 2)) # steering target - next tile of the free path
+        self.has_target = np.zeros(capacity, dtype=bool)
+        self.broken = np.zeros(capacity, dtype=bool)
+        self.coord_id = np.zeros((capacity, 2), dtype=np.int64) # ordinal coordinates of the last checked position
+        self.current_tile_id = np.zeros(capacity, dtype=np.int64) # tile at the last checked position (0 - no tile)
+        self.target_tile_id = np.zeros(capacity, dtype=np.int64) # current movement target (0 - no target)
+        self.collision_pending = np.zeros(capacity, dtype=bool) # other train entered the tile of the train after its check
+
+    def __len__(self):
+        return len(self.list_with_train_ids)
+
+    def get_arrays(self) -> list[str]:
+        """Return names of the arrays with parameters of the trains."""
+        return ["coord_world", "last_coord_world", "angle", "v_current", "v_target", "acceleration", 
+                "turn_speed", "target_coord_world", "has_target", "broken", "coord_id",
+                "current_tile_id", "target_tile_id", "collision_pending"]
+
+    def add_train(self, map, train):
+        """Add train to the fleet."""
+        index = len(self.list_with_train_ids)
+        # grow arrays
+        if index == len(self.angle):
+            for name in self.get_arrays():
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+        self.list_with_train_ids.append(train.id)
+        self.dict_with_indices[train.id] = index
+        self.coord_world[index] = train.coord_world
+        self.last_coord_world[index] = train.last_coord_world
+        self.angle[index] = train.angle
+        self.v_current[index] = train.v_current
+        self.acceleration[index] = train.acceleration
+        self.turn_speed[index] = train.turn_speed
+        self.coord_id[index] = map.world2id(train.coord_world)
+        self.current_tile_id[index] = train.tile_id
+        self.collision_pending[index] = False
+        self.load_events(map, train, index)
+        self.events_outdated = True
+
+    def remove_train(self, train_id: int):
+        """Remove train from the fleet - next trains are shifted in arrays to keep the order of trains."""
+        index = self.dict_with_indices.pop(train_id)
+        n = len(self.list_with_train_ids)
+        for name in self.get_arrays():
+            array = getattr(self, name)
+            array[index:n - 1] = array[index + 1:n]
+        self.list_with_train_ids.pop(index)
+        for shifted_index in range(index, n - 1):
+            self.dict_with_indices[self.list_with_train_ids[shifted_index]] = shifted_index
+        self.events_outdated = True
+
+    def load_events(self, map, train, index: int):
+        """Copy to arrays the parameters of the train set by the discrete events."""
+        train.set_velocity()
+        self.v_target[index] = train.v_target
+        self.v_current[index] = train.v_current
+        self.broken[index] = train.state == "broken"
+        self.target_tile_id[index] = train.movement_target[0] if len(train.movement_target) else 0
+        coord_steering_target = train.get_steering_target(map)
+        if coord_steering_target is None:
+            self.has_target[index] = False
+        else:
+            self.has_target[index] = True
+            self.target_coord_world[index] = coord_steering_target
+
+    def run(self, map, dict_with_trains):
+        """Life-cycle of all trains of the fleet - one tick of the simulation.
+        Events are handled as by Train.run: in order of trains, at positions before the move.
+        Only the trains whose check can change anything are checked:
+        trains on new tiles, trains standing on their targets and trains whose tile was entered by other train
+        (all trains after the change of paths or tracks and after commands)."""
+        n = len(self.list_with_train_ids)
+        if not n: return
+
+        # find trains to check
+        coord_world = self.coord_world[:n]
+        coord_id = map.world2id_batch(coord_world)
+        if self.events_outdated or map.paths_version != self.paths_version or map.topology_version != self.topology_version:
+            self.events_outdated = False
+            self.paths_version = map.paths_version
+            self.topology_version = map.topology_version
+            list_with_indices = list(range(n))
+        else:
+            to_check = np.any(coord_id != self.coord_id[:n], axis=1) | self.collision_pending[:n] \
+                        | ((self.target_tile_id[:n] == self.current_tile_id[:n]) & (self.target_tile_id[:n] != 0))
+            list_with_indices = np.flatnonzero(to_check).tolist()
+        self.coord_id[:n] = coord_id
+        self.collision_pending[:n] = False
+
+        # handle discrete events (trains checked later in this tick are added to the heap)
+        set_with_scheduled = set(list_with_indices)
+        while list_with_indices:
+            index = heapq.heappop(list_with_indices)
+            train = dict_with_trains[self.list_with_train_ids[index]]
+            self.store_train(train, index)
+            current_tile_id = map.get_tile_by_coord_id((int(coord_id[index, 0]), int(coord_id[index, 1])))
+            self.current_tile_id[index] = current_tile_id or 0
+            last_tile_id = train.tile_id
+            train.check_position(map, dict_with_trains, current_tile_id)
+            self.load_events(map, train, index)
+            # the train standing on the entered tile notices the collision in its own check
+            if train.tile_id != last_tile_id:
+                for other_train_id in map.get_trains_on_tile(train.tile_id):
+                    other_index = self.dict_with_indices.get(other_train_id, -1)
+                    if other_index > index and other_index not in set_with_scheduled:
+                        heapq.heappush(list_with_indices, other_index)
+                        set_with_scheduled.add(other_index)
+                    elif 0 <= other_index < index:
+                        self.collision_pending[other_index] = True
+
+        # set parameters related to train movement (as Train.accelerate)
+        v_current = self.v_current[:n]
+        v_target = self.v_target[:n]
+        acceleration = self.acceleration[:n]
+        self.turn_speed[:n] = v_current / 80
+        v_current[:] = np.where(self.broken[:n], v_current,
+                                np.where(v_target > v_current, np.minimum(v_current + acceleration, v_target),
+                                         np.where(v_target < v_current, np.maximum(v_current - acceleration, v_target), v_current)))
+
+        # turn to the steering targets
+        angle = self.angle[:n]
+        target_angle = angle_to_target_batch(coord_world, self.target_coord_world[:n])
+        angle[:] = np.where(self.has_target[:n], turn_to_target_angle_batch(angle, target_angle, self.turn_speed[:n]), angle)
+
+        # move the trains
+        self.last_coord_world[:n] = coord_world
+        coord_world[:] = move_point_batch(coord_world, v_current, angle)
+
+        # add positions to the traces (once per tick)
+        for train_id, coord_world in zip(self.list_with_train_ids, self.coord_world[:n].tolist()):
+            dict_with_trains[train_id].trace.add(coord_world)
+
+    def store_train(self, train, index: int):
+        """Copy the movement parameters from arrays to the train object."""
+        train.last_coord_world = (float(self.last_coord_world[index, 0]), float(self.last_coord_world[index, 1]))
+        train.coord_world = (float(self.coord_world[index, 0]), float(self.coord_world[index, 1]))
+        train.angle = float(self.angle[index])
+        train.v_current = float(self.v_current[index])
+        train.turn_speed = float(self.turn_speed[index])
+        train.set_state()
+
+    def sync_trains(self, dict_with_trains):
+        """Copy the movement parameters from arrays to all train objects (e.g. before drawing)."""
+        for index, train_id in enumerate(self.list_with_train_ids):
+            self.store_train(dict_with_trains[train_id], index)
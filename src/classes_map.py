@@ -1,138 +1,29 @@
 import pygame
+import os
 import math
 import random
+import numpy as np
+from collections import OrderedDict
 
 from settings import *
 from game_engine.definitions import *
 from game_engine.functions_math import *
+from classes_tiles import *
+from functions_map_file import *
+from classes_route_pool import *
+from functions_routing import *
+from classes_map_layer import *
 
-class Tile:
-    def __init__(self, id, coord_id, coord_world, list_with_tracks=None, type="grass", device="rail"):
-        """Initialization of the tile."""
-        self.id = id
-        self.coord_id = coord_id
-        self.coord_world = coord_world
-        self.tile_type = type
-        self.set_type(type)
-
-        if list_with_tracks is None: 
-            self.list_with_tracks = []
-        else: 
-            self.list_with_tracks = list_with_tracks
-        
-        self.device = device
-        self.check_rail_type()
-
-        # labels
-        self.font_obj = pygame.font.SysFont("arial", 20)
-
-    def draw(self, win, offset_x: int, offset_y: int, scale: float):
-        """Draw the Tile on the screen."""
-        coord_screen = world2screen(self.coord_world, offset_x, offset_y, scale) 
-        # draw background
-        pygame.draw.circle(win, self.color, coord_screen, 20*scale) # 50
-        # draw label
-        if scale >= 0.5:
-            text_obj = self.font_obj.render(f"{self.id}-{self.list_with_tracks}", True, self.color, BLACK) # {self.coord_id} {self.list_with_tracks}
-            win.blit(text_obj, coord_screen)
-
-    def set_type(self, type, depth=0):
-        """Set color of the tile depending on the type of terrain."""
-        self.type = type
-        self.depth = depth
-        if type == "mars": self.color = [MARS_RED[0] - random.randint(0, 20), MARS_RED[1] + random.randint(0, 20), MARS_RED[2]]
-        elif type == "snow": self.color = [SNOW_WHITE[0] - random.randint(0, 40), SNOW_WHITE[1] - random.randint(0, 10), SNOW_WHITE[2] - random.randint(0, 5)]
-        elif type == "sand": self.color = [SAND[0] - random.randint(0, 15), SAND[1] - random.randint(0, 15), SAND[2] - random.randint(0, 15)]
-        elif type == "grass": self.color = [GRASS[0], GRASS[1] - random.randint(0, 10), GRASS[2] - random.randint(0, 10)]
-        # elif type == "forest": self.color = [GREEN[0], GREEN[1] - random.randint(0, 20), GREEN[2]]
-        elif type == "forest": self.color = [GRASS[0], GRASS[1] - random.randint(0, 10) - 10, GRASS[2] - random.randint(0, 10)]
-        elif type == "snow_forest": self.color = [SNOW_WHITE[0] - random.randint(0, 40) - 20, SNOW_WHITE[1] - random.randint(0, 10) - 10, SNOW_WHITE[2] - random.randint(0, 5)]
-        elif type == "concrete": 
-            rand = random.randint(0, 10)
-            self.color = [GRAY[0] - rand, GRAY[1] - rand, GRAY[2] - rand]
-        elif type == "submerged_concrete":
-            rand = random.randint(0, 10)
-            # self.color = [GRAY[0] - rand, GRAY[1] - rand, GRAY[2] - rand]
-            self.color = [SHALLOW[0]- 4 * depth - rand, SHALLOW[1] - 8 * depth - rand, SHALLOW[2] - 8 * depth - rand] 
-        elif type == "water": 
-            depth -= 5
-            self.color = [WATER[0], WATER[1] - 4 * depth, WATER[2] - 8 * depth]
-        elif type == "shallow": 
-            self.color = [SHALLOW[0]- 4 * depth, SHALLOW[1] - 8 * depth, SHALLOW[2] - 8 * depth]        
-        else: self.color = RED
-
-    def add_track(self, tile_id: int):
-        """Add rail and check tile purpose again."""
-        if tile_id not in self.list_with_tracks:
-            self.list_with_tracks.append(tile_id)
-            self.check_rail_type()
-
-    def remove_track(self, tile_id: int):
-        """Remove rail and check tile purpose again."""
-        if tile_id in self.list_with_tracks:
-            self.list_with_tracks.remove(tile_id)
-            self.check_rail_type()
-
-    def check_rail_type(self):
-        """Check rail type: None, station, rail, end, switch, semaphore, error."""
-        if self.device not in ["station", "semaphore"]:
-            if len(self.list_with_tracks) == 0:
-                self.rail_type = None
-            elif len(self.list_with_tracks) == 1:
-                self.rail_type = "end"
-            elif len(self.list_with_tracks) == 2:
-                self.rail_type = "rail"
-            elif len(self.list_with_tracks) == 3:
-                self.rail_type = "switch"
-            else:
-                self.rail_type = "error"
-
-    # ----- SEMAPHORES ----------------------------------
-
-    def draw_semaphore(self, win, offset_x: int, offset_y: int, scale):
-        """Draw semaphore on the screen."""
-        if self.device == "semaphore":
-            semaphore_radius = 20
-            if self.semaphore_light == "red":
-                color = RED
-            elif self.semaphore_light == "green":
-                color = GREEN
-            coord_screen = world2screen(self.coord_world, offset_x, offset_y, scale)
-            pygame.draw.circle(win, WHITE, move_point(coord_screen, -semaphore_radius*scale, math.radians(self.semaphore_angle)), semaphore_radius*scale, 1)
-            pygame.draw.circle(win, WHITE, coord_screen, semaphore_radius*scale, 1)
-            # top light
-            pygame.draw.circle(win, color, move_point(coord_screen, semaphore_radius*scale, math.radians(self.semaphore_angle)), semaphore_radius*scale)
-
-    def add_semaphore(self, angle: int = 60):
-        """Add semaphore.
-        Angle in radians.
-        """
-        if len(self.list_with_tracks) == 2:
-            self.device = "semaphore"
-            self.semaphore_angle = angle
-            self.semaphore_light = "red"
 
-    def remove_semphore(self):
-        """Remove semaphore."""
-        if self.device == "semaphore":
-            self.device = "rail"
+# offsets of ordinal coordinates of the neighbors - clockwise from east (rows with odd index are shifted right)
+HEX_DIRECTIONS_EVEN_ROW = [(1, 0), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1)]
+HEX_DIRECTIONS_ODD_ROW = [(1, 0), (1, 1), (0, 1), (-1, 0), (0, -1), (1, -1)]
+HEX_DIRECTION_BY_OFFSET_EVEN_ROW = {offset: direction for direction, offset in enumerate(HEX_DIRECTIONS_EVEN_ROW)}
+HEX_DIRECTION_BY_OFFSET_ODD_ROW = {offset: direction for direction, offset in enumerate(HEX_DIRECTIONS_ODD_ROW)}
 
-    def turn_semaphore(self):
-        """Turn semaphore 180deg."""
-        if self.device == "semaphore":
-            self.semaphore_angle += 180
-            if self.semaphore_angle > 360:
-                self.semaphore_angle -= 360
-
-    def switch_semaphore(self):
-        """Change light of the semaphore."""
-        if self.semaphore_light == "red":
-            self.semaphore_light = "green"
-        elif self.semaphore_light == "green":
-            self.semaphore_light = "red"
-
-
-# ======================================================================
+# possible turns of the track and corresponding change of the direction
+TRACK_TURNS = ["right", "center", "left"]
+TRACK_TURN_DIRECTIONS = {"right": 1, "center": 0, "left": -1}
 
 
 class Map:
@@ -143,39 +34,84 @@ class Map:
         self.outer_tile_radius = tile_edge_length # outer radius = length of the edge
         self.inner_tile_radius = tile_edge_length * SQRT3 / 2 # inner radius
 
-        self.dict_with_tiles = {
-            1: Tile(1, (0, 0), self.id2world((0, 0)), [], "water"),
+        # compact store of tiles: tile_id -> Tile
+        self.dict_with_tiles = TileStore()
+        self.dict_with_tiles.add(1, (0, 0), self.id2world((0, 0)), [], "water")
 
-            2: Tile(2, (1, 0), self.id2world((1, 0)), [3,8]),
-            3: Tile(3, (2, 0), self.id2world((2, 0)), [2,4], "snow"),
-            4: Tile(4, (3, 0), self.id2world((3, 0)), [3,5]),
-            5: Tile(5, (4, 0), self.id2world((4, 0)), [4,6,16], "snow"),
-            6: Tile(6, (5, 0), self.id2world((5, 0)), [5,7]),
-            7: Tile(7, (6, 0), self.id2world((6, 0)), [6]),
+        self.dict_with_tiles.add(2, (1, 0), self.id2world((1, 0)), [3,8])
+        self.dict_with_tiles.add(3, (2, 0), self.id2world((2, 0)), [2,4], "snow")
+        self.dict_with_tiles.add(4, (3, 0), self.id2world((3, 0)), [3,5])
+        self.dict_with_tiles.add(5, (4, 0), self.id2world((4, 0)), [4,6,16], "snow")
+        self.dict_with_tiles.add(6, (5, 0), self.id2world((5, 0)), [5,7])
+        self.dict_with_tiles.add(7, (6, 0), self.id2world((6, 0)), [6])
 
-            8: Tile(8, (0, 1), self.id2world((0, 1)), [9,2]),
-            9: Tile(9, (0, 2), self.id2world((0, 2)), [8,10], "snow"),
-            10: Tile(10, (0, 3), self.id2world((0, 3)), [9,11]),
-            11: Tile(11, (0, 4), self.id2world((0, 4)), [10,12]),
-            12: Tile(12, (0, 5), self.id2world((0, 5)), [11]),
+        self.dict_with_tiles.add(8, (0, 1), self.id2world((0, 1)), [9,2])
+        self.dict_with_tiles.add(9, (0, 2), self.id2world((0, 2)), [8,10], "snow")
+        self.dict_with_tiles.add(10, (0, 3), self.id2world((0, 3)), [9,11])
+        self.dict_with_tiles.add(11, (0, 4), self.id2world((0, 4)), [10,12])
+        self.dict_with_tiles.add(12, (0, 5), self.id2world((0, 5)), [11])
 
-            14: Tile(14, (-1, 0), self.id2world((-1, 0)), [], "water"),
-            15: Tile(15, (-2, 0), self.id2world((-2, 0)), [], "water"),
+        self.dict_with_tiles.add(14, (-1, 0), self.id2world((-1, 0)), [], "water")
+        self.dict_with_tiles.add(15, (-2, 0), self.id2world((-2, 0)), [], "water")
 
-            19: Tile(19, (0, -1), self.id2world((0, -1)), [], "water"),
-            20: Tile(20, (0, -2), self.id2world((0, -2)), [], "water"),
+        self.dict_with_tiles.add(19, (0, -1), self.id2world((0, -1)), [], "water")
+        self.dict_with_tiles.add(20, (0, -2), self.id2world((0, -2)), [], "water")
 
-            16: Tile(16, (4, 1), self.id2world((4, 1)), [5,17], "snow"),
-            17: Tile(17, (5, 1), self.id2world((5, 1)), [16,18]),
-            18: Tile(18, (6, 1), self.id2world((6, 1)), [17]),
-        }
+        self.dict_with_tiles.add(16, (4, 1), self.id2world((4, 1)), [5,17], "snow")
+        self.dict_with_tiles.add(17, (5, 1), self.id2world((5, 1)), [16,18])
+        self.dict_with_tiles.add(18, (6, 1), self.id2world((6, 1)), [17])
         self.lowest_free_id = 21
 
         for x in range(1,30):
             for y in range(2,20):
-                self.dict_with_tiles[self.lowest_free_id] = Tile(self.lowest_free_id, (x, y), self.id2world((x, y)))
+                self.dict_with_tiles.add(self.lowest_free_id, (x, y), self.id2world((x, y)))
                 self.lowest_free_id += 1
 
+        # spatial buckets of trains - square chunks of chunk_size x chunk_size tiles
+        # (tiles of the chunks and the index of ordinal coordinates are kept by the tile store)
+        self.chunk_size = self.dict_with_tiles.chunk_size
+        self.dict_with_chunk_trains = {} # chunk -> set of IDs of trains
+        self.dict_with_train_chunks = {} # train_id -> chunk
+
+        # table of ports: tile_id -> {incoming_tile_id: (right_tile_id, center_tile_id, left_tile_id)}
+        self.dict_with_ports = {}
+        for tile_id in self.dict_with_tiles:
+            self.update_ports(tile_id)
+
+        # dependencies of trains paths
+        self.set_with_changed_tiles = set() # tiles changed since the last calculation of paths
+        self.dict_with_path_dependencies = {} # tile_id -> set of IDs of trains whose path crosses the tile
+        self.dict_with_train_dependencies = {} # train_id -> set of IDs of tiles crossed by the train path
+        self.dict_with_reservations = {} # block_id -> ID of the train reserving the block (since the last calculation of paths)
+        self.paths_version = 0 # incremented on every calculation of paths
+        self.topology_version = 0 # incremented on every change of tiles, tracks or semaphores
+
+        # pool of processes searching routes of trains (disabled until enable_route_pool is called)
+        self.route_pool = None
+
+        # occupancy of tiles: tile_id -> set of IDs of trains on the tile
+        self.dict_with_occupied_tiles = {}
+
+        # blocks of the signalling - chains of tracks bounded by switches, ends and semaphores (built on the first use)
+        self.dict_with_tile_blocks = {} # tile_id -> block_id
+        self.dict_with_block_tiles = {} # block_id -> list of IDs of tiles
+        self.dict_with_block_trains = {} # block_id -> set of IDs of trains in the block
+        self.lowest_free_block_id = 1
+
+        # contracted routing graph - edges along the chains of tracks (built on the first use)
+        self.dict_with_route_edges = {} # (tile_id, next_tile_id) -> (end state or None, number of tiles)
+        self.dict_with_block_edges = {} # block_id -> list of edges crossing the block
+
+        # cached static layer with terrain and tracks
+        self.layer = MapLayer(self)
+
+        # storage of chunks unloaded to disk (disabled until enable_chunk_storage is called)
+        self.chunk_storage_directory = None
+        self.max_loaded_chunks = 0
+        self.chunk_generator = None # function creating tiles of the new chunk - (map, chunk) -> None
+        self.dict_with_loaded_chunks = OrderedDict() # chunk -> None, the least recently required first
+        self.set_with_unloaded_chunks = set() # chunks written to disk or not indexed yet after loading the map file
+
         # self.create_station((-10, -20), 0)
         # self.create_station((-30, -20), 180)
         # self.create_station((-10, -40), 60)
@@ -184,23 +120,25 @@ class Map:
             self.create_station((-50 + 10*random.randint(0, 10), -5 - 5*random.randint(0, 10)), 180*random.randint(0, 1))
 
     def draw(self, win, offset_x: int, offset_y: int, scale):
-        """Draw the Map on the screen."""
-        for tile_id in self.dict_with_tiles:
-            tile = self.dict_with_tiles[tile_id]
-            tile.draw(win, offset_x, offset_y, scale)
-            # draw tracks
-            coord_screen = world2screen(tile.coord_world, offset_x, offset_y, scale)
-            for neighbor_tile_id in tile.list_with_tracks:
-                neighbor_coord_screen = world2screen(self.dict_with_tiles[neighbor_tile_id].coord_world, offset_x, offset_y, scale)
-                if self.dict_with_tiles[tile_id].device == "station" and self.dict_with_tiles[neighbor_tile_id].device == "station":
-                    pygame.draw.line(win, GRAY, coord_screen, neighbor_coord_screen, int(40*scale))
-                pygame.draw.line(win, WHITE, coord_screen, neighbor_coord_screen, 1) # int(12*scale)) # , RED
+        """Draw the Map on the screen (from the cached layer)."""
+        self.layer.draw(win, offset_x, offset_y, scale)
+
+    def draw_tile(self, win, tile_id: int, offset_x: int, offset_y: int, scale):
+        """Draw the tile with its tracks on the screen."""
+        tile = self.dict_with_tiles[tile_id]
+        tile.draw(win, offset_x, offset_y, scale)
+        # draw tracks
+        coord_screen = world2screen(tile.coord_world, offset_x, offset_y, scale)
+        for neighbor_tile_id in tile.list_with_tracks:
+            neighbor_coord_screen = world2screen(self.dict_with_tiles[neighbor_tile_id].coord_world, offset_x, offset_y, scale)
+            if self.dict_with_tiles[tile_id].device == "station" and self.dict_with_tiles[neighbor_tile_id].device == "station":
+                pygame.draw.line(win, GRAY, coord_screen, neighbor_coord_screen, int(40*scale))
+            pygame.draw.line(win, WHITE, coord_screen, neighbor_coord_screen, 1) # int(12*scale)) # , RED
 
     def draw_semaphore(self, win, offset_x: int, offset_y: int, scale):
         """Draw semaphore on the screen."""
-        for tile_id in self.dict_with_tiles:
-            tile = self.dict_with_tiles[tile_id]
-            tile.draw_semaphore(win, offset_x, offset_y, scale)
+        for tile_id in self.get_tiles_in_world_rect(*self.get_view_world_rect(win, offset_x, offset_y, scale)):
+            self.dict_with_tiles[tile_id].draw_semaphore(win, offset_x, offset_y, scale)
 
     def draw_grid(self, win, offset_x: int, offset_y: int, scale):
         """Draw grid of the Map on the screen."""
@@ -216,11 +154,16 @@ class Map:
         Return ID of the created/updated tile."""
         tile_id = self.get_tile_by_coord_id(coord_id)
         if not tile_id:
-            self.dict_with_tiles[self.lowest_free_id] = Tile(self.lowest_free_id, coord_id, self.id2world(coord_id), [], terrain)
+            self.dict_with_tiles.add(self.lowest_free_id, coord_id, self.id2world(coord_id), [], terrain)
+            self.update_ports_around(self.lowest_free_id)
+            self.set_with_changed_tiles.add(self.lowest_free_id)
+            self.topology_version += 1
+            self.layer.invalidate_tile(self.dict_with_tiles[self.lowest_free_id].coord_world)
             self.lowest_free_id += 1
             return self.lowest_free_id - 1
         elif self.dict_with_tiles[tile_id].type != terrain:
             self.dict_with_tiles[tile_id].set_type(terrain)
+            self.layer.invalidate_tile(self.dict_with_tiles[tile_id].coord_world)
             return tile_id
 
     def remove_tile(self, tile_id: int):
@@ -229,8 +172,18 @@ class Map:
         for neighbor_tile_id in self.dict_with_tiles[tile_id].list_with_tracks:
             if tile_id in self.dict_with_tiles[neighbor_tile_id].list_with_tracks:
                 self.dict_with_tiles[neighbor_tile_id].remove_track(tile_id)
+            self.layer.invalidate_track(self.dict_with_tiles[tile_id].coord_world, self.dict_with_tiles[neighbor_tile_id].coord_world)
+        self.layer.invalidate_tile(self.dict_with_tiles[tile_id].coord_world)
+        list_with_touched_tiles = self.get_neighbors_id(tile_id) + self.dict_with_tiles[tile_id].list_with_tracks
         # remove tile
         del self.dict_with_tiles[tile_id]
+        self.dict_with_ports.pop(tile_id, None)
+        for touched_tile_id in list_with_touched_tiles:
+            self.update_ports(touched_tile_id)
+        self.invalidate_blocks([tile_id] + list_with_touched_tiles)
+        self.set_with_changed_tiles.add(tile_id)
+        self.set_with_changed_tiles.update(list_with_touched_tiles)
+        self.topology_version += 1
 
     def add_track(self, first_tile_id: int, second_tile_id: int):
         """Add new track (connection between tiles) by adding ids of connected 
@@ -244,6 +197,12 @@ class Map:
                 or (self.dict_with_tiles[second_tile_id].device == "rail" and len(self.dict_with_tiles[second_tile_id].list_with_tracks) < 3)) :
             self.dict_with_tiles[first_tile_id].add_track(second_tile_id)
             self.dict_with_tiles[second_tile_id].add_track(first_tile_id)
+            self.update_ports(first_tile_id)
+            self.update_ports(second_tile_id)
+            self.invalidate_blocks([first_tile_id, second_tile_id])
+            self.set_with_changed_tiles.update([first_tile_id, second_tile_id])
+            self.topology_version += 1
+            self.layer.invalidate_track(self.dict_with_tiles[first_tile_id].coord_world, self.dict_with_tiles[second_tile_id].coord_world)
 
     def remove_track(self, first_tile_id: int, second_tile_id: int):
         """Remove track (connection between tiles) by removing ids of connected 
@@ -255,33 +214,148 @@ class Map:
                     and self.dict_with_tiles[second_tile_id].device not in ["station", "semaphore"]:
             self.dict_with_tiles[first_tile_id].remove_track(second_tile_id)
             self.dict_with_tiles[second_tile_id].remove_track(first_tile_id)
+            self.update_ports(first_tile_id)
+            self.update_ports(second_tile_id)
+            self.invalidate_blocks([first_tile_id, second_tile_id])
+            self.set_with_changed_tiles.update([first_tile_id, second_tile_id])
+            self.topology_version += 1
+            self.layer.invalidate_track(self.dict_with_tiles[first_tile_id].coord_world, self.dict_with_tiles[second_tile_id].coord_world)
 
     def get_tile_by_coord_id(self, coord_id: tuple[int, int]) -> int:
-        """Return ID of tile indicated by ordinal coordinates."""
-        for tile_id in self.dict_with_tiles:
-            if self.dict_with_tiles[tile_id].coord_id == coord_id:
-                return self.dict_with_tiles[tile_id].id
+        """Return ID of tile indicated by ordinal coordinates.
+        The chunk containing the tile is loaded from disk if needed."""
+        # inlined TileStore.get_tile_id (called for every train in every tick)
+        x_id, y_id = coord_id
+        chunk_size = self.chunk_size
+        chunk_columns = self.dict_with_tiles.dict_with_chunks.get((x_id // chunk_size, y_id // chunk_size))
+        if chunk_columns is None: return False
+        tile_id = chunk_columns.coord_tile_ids[x_id % chunk_size + y_id % chunk_size * chunk_size]
+        if tile_id and (self.dict_with_tiles.exists[tile_id] == 1 or tile_id in self.dict_with_tiles): return tile_id
+        return False
+
+    def get_loaded_tile_by_coord_id(self, coord_id: tuple[int, int]) -> int:
+        """Return ID of tile indicated by ordinal coordinates only if the tile is loaded."""
+        tile_id = self.dict_with_tiles.get_tile_id(coord_id)
+        if tile_id and self.dict_with_tiles.exists[tile_id] == 1: return tile_id
         return False
     
+    def get_chunk(self, coord_id: tuple[int, int]) -> tuple[int, int]:
+        """Return the chunk containing the tile with given ordinal coordinates."""
+        return (coord_id[0] // self.chunk_size, coord_id[1] // self.chunk_size)
+
+    def get_chunks_in_world_rect(self, left: float, top: float, right: float, bottom: float) -> list[tuple[int, int]]:
+        """Return chunks overlapping the rectangle given in world coordinates."""
+        first_x_id, first_y_id = self.world2id((left, top))
+        last_x_id, last_y_id = self.world2id((right, bottom))
+        first_chunk_x, first_chunk_y = self.get_chunk((first_x_id - 1, first_y_id))
+        last_chunk_x, last_chunk_y = self.get_chunk((last_x_id + 1, last_y_id))
+        return [(chunk_x, chunk_y) for chunk_x in range(first_chunk_x, last_chunk_x + 1) 
+                                        for chunk_y in range(first_chunk_y, last_chunk_y + 1)]
+
+    def get_tiles_in_world_rect(self, left: float, top: float, right: float, bottom: float) -> list[int]:
+        """Return IDs of tiles with centers lying (approximately) in the rectangle given in world coordinates."""
+        first_x_id, first_y_id = self.world2id((left, top))
+        last_x_id, last_y_id = self.world2id((right, bottom))
+        first_x_id -= 1
+        last_x_id += 1
+        list_with_tiles = []
+        for chunk in self.get_chunks_in_world_rect(left, top, right, bottom):
+            if chunk in self.set_with_unloaded_chunks: continue
+            list_with_chunk_tiles = self.dict_with_tiles.get_chunk_tile_ids(chunk)
+            # chunk lying entirely in the rectangle
+            if first_x_id <= chunk[0] * self.chunk_size and (chunk[0] + 1) * self.chunk_size - 1 <= last_x_id \
+                    and first_y_id <= chunk[1] * self.chunk_size and (chunk[1] + 1) * self.chunk_size - 1 <= last_y_id:
+                list_with_tiles.extend(list_with_chunk_tiles)
+                continue
+            for tile_id in list_with_chunk_tiles:
+                x_id, y_id = self.dict_with_tiles.get_coord_id(tile_id)
+                if first_x_id <= x_id <= last_x_id and first_y_id <= y_id <= last_y_id:
+                    list_with_tiles.append(tile_id)
+        return list_with_tiles
+
+    def get_trains_in_world_rect(self, left: float, top: float, right: float, bottom: float) -> list[int]:
+        """Return IDs of trains in chunks overlapping the rectangle given in world coordinates."""
+        list_with_trains = []
+        for chunk in self.get_chunks_in_world_rect(left, top, right, bottom):
+            list_with_trains.extend(self.dict_with_chunk_trains.get(chunk, ()))
+        return list_with_trains
+
+    def get_view_world_rect(self, win, offset_x: int, offset_y: int, scale, margin: float = None) -> tuple[float, float, float, float]:
+        """Return rectangle (left, top, right, bottom) in world coordinates visible on the screen.
+        The rectangle is extended by margin (the size of the tile by default)."""
+        if margin is None: margin = 2 * self.inner_tile_radius
+        win_width, win_height = win.get_size()
+        left, top = screen2world((0, 0), offset_x, offset_y, scale)
+        right, bottom = screen2world((win_width, win_height), offset_x, offset_y, scale)
+        return (left - margin, top - margin, right + margin, bottom + margin)
+
     def get_track_by_coord_world(self, coord_world: tuple[float, float]) -> tuple[int, int]:
-        """Return pair of IDs of tiles indicated by global (world) coordinates."""
+        """Return pair of IDs of tiles indicated by global (world) coordinates.
+        Only the neighbors of the tile under the cursor are considered,
+        the neighbors connected by track are preferred."""
         # find the first tile
         first_tile_coord_id = self.world2id(coord_world)
         first_tile_id = self.get_tile_by_coord_id(first_tile_coord_id)
         if not first_tile_id: return False, False
         # find the second tile
+        list_with_tracks = self.dict_with_tiles[first_tile_id].list_with_tracks
         dist_to_closest = 9999
         id_of_closest = 0
-        for tile_id in self.dict_with_tiles:
+        is_closest_linked = False
+        for neighbor_coord_id in self.get_neighbors_coord_id(first_tile_coord_id):
+            tile_id = self.get_tile_by_coord_id(neighbor_coord_id)
+            if not tile_id: continue
+            is_linked = tile_id in list_with_tracks
             dist = dist_two_points(coord_world, self.dict_with_tiles[tile_id].coord_world)
-            if dist < dist_to_closest and tile_id != first_tile_id:
+            if (is_linked and not is_closest_linked) \
+                    or (is_linked == is_closest_linked and dist < dist_to_closest):
                 dist_to_closest = dist
                 id_of_closest = tile_id
+                is_closest_linked = is_linked
         if id_of_closest:
             return first_tile_id, id_of_closest
         # no tile found
         return False, False
 
+    def get_tile_coord_id(self, tile_id: int) -> tuple[int, int]:
+        """Return ordinal coordinates of the tile (the tile is not loaded if it is unloaded)."""
+        return self.dict_with_tiles.get_coord_id(tile_id)
+
+    def get_neighbor_coord_id(self, coord_id: tuple[int, int], direction: int) -> tuple[int, int]:
+        """Return ordinal coordinates of the neighbor in given direction.
+        Directions are numbered clockwise from 0 (east) to 5, every 60 degrees."""
+        x_id, y_id = coord_id
+        if y_id % 2:
+            dx, dy = HEX_DIRECTIONS_ODD_ROW[direction % 6]
+        else:
+            dx, dy = HEX_DIRECTIONS_EVEN_ROW[direction % 6]
+        return (x_id + dx, y_id + dy)
+
+    def get_neighbors_coord_id(self, coord_id: tuple[int, int]) -> list[tuple[int, int]]:
+        """Return ordinal coordinates of all six neighbors of the tile."""
+        return [self.get_neighbor_coord_id(coord_id, direction) for direction in range(6)]
+
+    def get_neighbors_id(self, tile_id: int) -> list[int]:
+        """Return IDs of existing neighbors of the tile (only from the loaded chunks)."""
+        list_with_neighbors = []
+        for neighbor_coord_id in self.get_neighbors_coord_id(self.dict_with_tiles[tile_id].coord_id):
+            neighbor_tile_id = self.get_loaded_tile_by_coord_id(neighbor_coord_id)
+            if neighbor_tile_id: list_with_neighbors.append(neighbor_tile_id)
+        return list_with_neighbors
+
+    def get_direction(self, coord_id_1: tuple[int, int], coord_id_2: tuple[int, int]):
+        """Return direction from the first tile to the second one.
+        Return None if tiles are not neighbors."""
+        offset = (coord_id_2[0] - coord_id_1[0], coord_id_2[1] - coord_id_1[1])
+        if coord_id_1[1] % 2:
+            return HEX_DIRECTION_BY_OFFSET_ODD_ROW.get(offset)
+        else:
+            return HEX_DIRECTION_BY_OFFSET_EVEN_ROW.get(offset)
+
+    def hex_distance(self, coord_id_1: tuple[int, int], coord_id_2: tuple[int, int]) -> int:
+        """Return the number of steps between two tiles on the hex grid."""
+        return hex_distance(coord_id_1, coord_id_2)
+
     def id2world(self, coord_id: tuple[int, int]) -> tuple[float, float]:
         """Calculate coordinates from tile's id to world coordinate system.
         Return coordinates in the world coordinate system."""
@@ -304,6 +378,15 @@ class Map:
             x_id = math.floor(x_world / self.inner_tile_radius / 2 + 0.5)
         return (x_id, y_id)
     
+    def world2id_batch(self, coords_world: np.ndarray) -> np.ndarray:
+        """Calculate coordinates of points from world coordinate system to tile's ids.
+        Points are given as array of shape (n, 2).
+        Return array of tile's id coordinates."""
+        coords_world = np.asarray(coords_world, dtype=float)
+        y_id = np.floor(2 / 3 * coords_world[..., 1] / self.outer_tile_radius + 0.5)
+        x_id = np.floor(coords_world[..., 0] / self.inner_tile_radius / 2 + np.where(y_id % 2, 0, 0.5))
+        return np.stack([x_id, y_id], axis=-1).astype(np.int64)
+
     def extrapolate_tile_position_in_line(self, coord_1: tuple[int, int], 
                                 coord_2: tuple[int, int]) -> tuple[int, int]:
         """Extrapolate the position of the tile in straight line 
@@ -337,6 +420,11 @@ class Map:
     def extrapolate_tile_position_with_id(self, id_1: int, id_2: int, turn: str = "center") -> id:
         """Extrapolate the ID of the tile based on the IDs of the two previous ones.
         Possible turns: left, right, center."""
+        coord_id_2 = self.dict_with_tiles[id_2].coord_id
+        direction = self.get_direction(self.dict_with_tiles[id_1].coord_id, coord_id_2)
+        if direction is not None:
+            return self.get_tile_by_coord_id(self.get_neighbor_coord_id(coord_id_2, direction + TRACK_TURN_DIRECTIONS[turn]))
+        # tiles are not neighbors
         coord_world_2 = self.dict_with_tiles[id_2].coord_world
         angle = angle_to_target(self.dict_with_tiles[id_1].coord_world, coord_world_2)
         delta_angle = 0
@@ -344,18 +432,74 @@ class Map:
         if turn == "left": delta_angle = -math.pi/3
         coord_world_3 = move_point(coord_world_2, 2 * self.inner_tile_radius, angle + delta_angle)
         return self.get_tile_by_coord_id(self.world2id(coord_world_3))
-    
+
+    def update_ports(self, tile_id: int):
+        """Rebuild the table of ports of the tile.
+        For each neighbor from which the train can come, the table holds IDs
+        of the tiles connected by track to the right, center and left (0 if there is no track)."""
+        if tile_id not in self.dict_with_tiles or not self.dict_with_tiles.get_number_of_tracks(tile_id):
+            # trains never enter tiles without tracks - the table is not kept
+            self.dict_with_ports.pop(tile_id, None)
+            return
+        self.dict_with_ports[tile_id] = self.calculate_ports(tile_id)
+
+    def calculate_ports(self, tile_id: int) -> dict:
+        """Return the table of ports of the tile with tracks (the tile is not loaded if it is unloaded)."""
+        list_with_tracks = self.dict_with_tiles.get_tracks(tile_id)
+        coord_id = self.dict_with_tiles.get_coord_id(tile_id)
+        neighbors_id = [self.get_loaded_tile_by_coord_id(neighbor_coord_id) for neighbor_coord_id in self.get_neighbors_coord_id(coord_id)]
+        # tiles connected by track can lie in the unloaded chunks
+        for track_tile_id in list_with_tracks:
+            direction = self.get_direction(coord_id, self.dict_with_tiles.get_coord_id(track_tile_id))
+            if direction is not None and not neighbors_id[direction]:
+                neighbors_id[direction] = track_tile_id
+        ports = {}
+        for direction, incoming_tile_id in enumerate(neighbors_id):
+            if not incoming_tile_id: continue
+            # the train coming from the neighbor moves in the opposite direction
+            heading = direction + 3
+            outgoing_tiles = []
+            for track_turn in TRACK_TURNS:
+                next_tile_id = neighbors_id[(heading + TRACK_TURN_DIRECTIONS[track_turn]) % 6]
+                outgoing_tiles.append(next_tile_id if next_tile_id in list_with_tracks else 0)
+            ports[incoming_tile_id] = tuple(outgoing_tiles)
+        return ports
+
+    def update_ports_around(self, tile_id: int):
+        """Rebuild the tables of ports of the tile and of its neighbors."""
+        self.update_ports(tile_id)
+        for neighbor_tile_id in self.get_neighbors_id(tile_id):
+            self.update_ports(neighbor_tile_id)
+
+    def get_next_tiles(self, last_tile_id: int, current_tile_id: int) -> tuple[int, int, int]:
+        """Return IDs of the tiles connected by track to the right, center and left
+        (0 if there is no track) for the train coming from the last tile."""
+        ports = self.dict_with_ports.get(current_tile_id)
+        if ports is None and current_tile_id in self.dict_with_tiles and self.dict_with_tiles.get_number_of_tracks(current_tile_id):
+            # the table is built on the first use (e.g. after loading the map from file)
+            self.update_ports(current_tile_id)
+            ports = self.dict_with_ports.get(current_tile_id)
+        if ports is not None and last_tile_id in ports:
+            return ports[last_tile_id]
+        # the last tile is not a neighbor - extrapolate the position
+        list_with_tracks = self.dict_with_tiles[current_tile_id].list_with_tracks
+        outgoing_tiles = []
+        for track_turn in TRACK_TURNS:
+            next_tile_id = self.extrapolate_tile_position_with_id(last_tile_id, current_tile_id, turn=track_turn)
+            outgoing_tiles.append(next_tile_id if next_tile_id in list_with_tracks else 0)
+        return tuple(outgoing_tiles)
+
     def find_route(self, target_tile_id: int, last_tile_id: int, current_tile_id: int, \
                         search_history: list[tuple[int, str]] = [], countdown: int = 100) -> list[int]:
         """Recursive function that searches for a train route. 
         The search is interrupted if the function finds a target, or is called too many times, 
-        or detects that the train is running in a loop."""
+        or detects that the train is running in a loop.
+        Kept for comparison with find_shortest_route."""
         # check if the recursion is not too deep
         if not countdown: return []
         # check angles and switches first
-        for track_turn in ["right", "center", "left"]:
-            next_tile_id = self.extrapolate_tile_position_with_id(last_tile_id, current_tile_id, turn=track_turn)
-            if next_tile_id in self.dict_with_tiles[current_tile_id].list_with_tracks:
+        for track_turn, next_tile_id in zip(TRACK_TURNS, self.get_next_tiles(last_tile_id, current_tile_id)):
+            if next_tile_id:
                 # check if next tile is the target
                 if next_tile_id == target_tile_id: return [next_tile_id]
                 # check if the train is running in loop
@@ -366,20 +510,178 @@ class Map:
                 if path: return [next_tile_id] + path
         return []
 
+    def find_shortest_route(self, target_tile_id: int, last_tile_id: int, current_tile_id: int) -> list[int]:
+        """Search for the shortest train route with the A* algorithm in the contracted routing graph
+        (chains of tracks between switches, ends and semaphores are single edges, see functions_routing).
+        The search runs over directed states (last tile, current tile), so the train never reverses,
+        each state is visited at most once and the length of the route is not limited.
+        Return list of IDs of the next tiles up to the target or empty list if there is no route."""
+        if target_tile_id not in self.dict_with_tiles or current_tile_id not in self.dict_with_tiles: return []
+        return search_shortest_route(self, target_tile_id, last_tile_id, current_tile_id)
+
+    def get_route_edge(self, tile_id: int, next_tile_id: int) -> tuple:
+        """Return the edge of the contracted routing graph starting with the step from the tile to the next tile
+        (the edge is created on the first use and removed with the blocks it crosses)."""
+        edge = self.dict_with_route_edges.get((tile_id, next_tile_id))
+        if edge is None:
+            edge = create_route_edge(self, tile_id, next_tile_id)
+            self.dict_with_route_edges[(tile_id, next_tile_id)] = edge
+            for edge_tile_id in [tile_id, next_tile_id] + ([edge[0][1]] if edge[0] is not None else []):
+                self.dict_with_block_edges.setdefault(self.get_block_id(edge_tile_id), []).append((tile_id, next_tile_id))
+        return edge
+
     def find_next_track(self, last_tile_id: int, current_tile_id: int) -> int:
         """Find and return the next tile on the route."""
-        for track_turn in ["right", "center", "left"]:
-            next_tile_id = self.extrapolate_tile_position_with_id(last_tile_id, current_tile_id, turn=track_turn)
-            if next_tile_id in self.dict_with_tiles[current_tile_id].list_with_tracks:
+        for next_tile_id in self.get_next_tiles(last_tile_id, current_tile_id):
+            if next_tile_id:
                 return next_tile_id
         return 0
 
     def calculate_trains_path(self, dict_with_trains: dict):
-        """Calls methods calculating the route for all trains."""
-        dict_with_reservations = {}
+        """Calls methods calculating the route for all trains.
+        Whole paths are recalculated only for trains with outdated paths
+        or with paths crossing the tiles changed since the last call.
+        Free paths are recalculated for all trains."""
+        # forget removed trains
+        for train_id in [train_id for train_id in self.dict_with_train_dependencies if train_id not in dict_with_trains]:
+            self.set_path_dependencies(train_id, [])
+        # check which trains are affected by changes of the map
+        if self.set_with_changed_tiles:
+            for tile_id in self.set_with_changed_tiles:
+                for train_id in self.dict_with_path_dependencies.get(tile_id, ()):
+                    dict_with_trains[train_id].path_outdated = True
+            self.set_with_changed_tiles.clear()
+            # the changes could create the missing route
+            for train_id in dict_with_trains:
+                if len(dict_with_trains[train_id].movement_target) and not len(dict_with_trains[train_id].movement_whole_path):
+                    dict_with_trains[train_id].path_outdated = True
+
+        self.paths_version += 1
+        # whole paths do not depend on each other - they can be searched in parallel
+        list_with_outdated_trains = [train_id for train_id in dict_with_trains if dict_with_trains[train_id].path_outdated]
+        if self.route_pool is not None:
+            self.route_pool.find_movement_whole_paths(self, [dict_with_trains[train_id] for train_id in list_with_outdated_trains])
+        for train_id in list_with_outdated_trains:
+            if dict_with_trains[train_id].path_outdated: # not found by the pool
+                dict_with_trains[train_id].find_movement_whole_path(self)
+            self.set_path_dependencies(train_id, [dict_with_trains[train_id].tile_id] + dict_with_trains[train_id].movement_whole_path)
+        # free paths depend on reservations of the previous trains - they are found one after another
+        self.dict_with_reservations = {}
         for train_id in dict_with_trains:
-            dict_with_trains[train_id].find_movement_whole_path(self)
-            dict_with_trains[train_id].find_movement_free_path(self, dict_with_trains, dict_with_reservations)
+            dict_with_trains[train_id].find_movement_free_path(self, dict_with_trains, self.dict_with_reservations)
+
+    def calculate_train_path(self, train, dict_with_trains: dict):
+        """Recalculate the route of one train (e.g. after reaching its target) between the calculations of all paths.
+        The free path takes only blocks not reserved by other trains in the last calculation,
+        so it does not conflict with their free paths - the blocks released by the train are given to them in the next calculation."""
+        if train.path_outdated:
+            train.find_movement_whole_path(self)
+            self.set_path_dependencies(train.id, [train.tile_id] + train.movement_whole_path)
+        train.find_movement_free_path(self, dict_with_trains, self.dict_with_reservations)
+
+    def set_path_dependencies(self, train_id: int, list_with_tiles: list[int]):
+        """Set the tiles on which the path of the train depends."""
+        for tile_id in self.dict_with_train_dependencies.pop(train_id, ()):
+            self.dict_with_path_dependencies[tile_id].discard(train_id)
+            if not self.dict_with_path_dependencies[tile_id]:
+                del self.dict_with_path_dependencies[tile_id]
+        if len(list_with_tiles):
+            self.dict_with_train_dependencies[train_id] = set(list_with_tiles)
+            for tile_id in list_with_tiles:
+                self.dict_with_path_dependencies.setdefault(tile_id, set()).add(train_id)
+
+    def occupy_tile(self, train_id: int, tile_id: int):
+        """Mark the tile as occupied by the train."""
+        self.dict_with_occupied_tiles.setdefault(tile_id, set()).add(train_id)
+        self.dict_with_block_trains.setdefault(self.get_block_id(tile_id), set()).add(train_id)
+        # spatial bucket of the train
+        chunk = self.get_chunk(self.dict_with_tiles[tile_id].coord_id)
+        self.dict_with_chunk_trains.setdefault(chunk, set()).add(train_id)
+        self.dict_with_train_chunks[train_id] = chunk
+
+    def release_tile(self, train_id: int, tile_id: int):
+        """Mark the tile as no longer occupied by the train."""
+        if tile_id in self.dict_with_occupied_tiles:
+            self.dict_with_occupied_tiles[tile_id].discard(train_id)
+            if not self.dict_with_occupied_tiles[tile_id]:
+                del self.dict_with_occupied_tiles[tile_id]
+        block_id = self.dict_with_tile_blocks.get(tile_id)
+        if block_id in self.dict_with_block_trains:
+            self.dict_with_block_trains[block_id].discard(train_id)
+            if not self.dict_with_block_trains[block_id]:
+                del self.dict_with_block_trains[block_id]
+        # spatial bucket of the train
+        chunk = self.dict_with_train_chunks.pop(train_id, None)
+        if chunk is not None:
+            self.dict_with_chunk_trains[chunk].discard(train_id)
+
+    def get_trains_on_tile(self, tile_id: int) -> set[int]:
+        """Return IDs of trains occupying the tile."""
+        return self.dict_with_occupied_tiles.get(tile_id, set())
+
+    # ----- BLOCKS ----------------------------------
+
+    def is_block_boundary(self, tile_id: int) -> bool:
+        """Check if the tile bounds blocks - switches, ends of tracks and semaphores are blocks of one tile."""
+        return self.dict_with_tiles.get_number_of_tracks(tile_id) != 2 \
+                    or self.dict_with_tiles.device[tile_id] == DEVICE_CODES["semaphore"]
+
+    def get_block_id(self, tile_id: int) -> int:
+        """Return ID of the block of the tile (the block is built on the first use)."""
+        block_id = self.dict_with_tile_blocks.get(tile_id)
+        if block_id is None:
+            block_id = self.create_block(tile_id)
+        return block_id
+
+    def create_block(self, tile_id: int) -> int:
+        """Create the block with the tile - the tile alone if it bounds blocks,
+        otherwise the whole chain of tracks between the boundaries.
+        Return ID of the block."""
+        block_id = self.lowest_free_block_id
+        self.lowest_free_block_id += 1
+        list_with_tiles = [tile_id]
+        self.dict_with_tile_blocks[tile_id] = block_id
+        if not self.is_block_boundary(tile_id):
+            # tracks are read straight from the store, so the unloaded tiles are not loaded
+            index = 0
+            while index < len(list_with_tiles):
+                for track_tile_id in self.dict_with_tiles.get_tracks(list_with_tiles[index]):
+                    if track_tile_id not in self.dict_with_tile_blocks and not self.is_block_boundary(track_tile_id):
+                        self.dict_with_tile_blocks[track_tile_id] = block_id
+                        list_with_tiles.append(track_tile_id)
+                index += 1
+        self.dict_with_block_tiles[block_id] = list_with_tiles
+        # trains already in the block
+        set_with_trains = set()
+        for block_tile_id in list_with_tiles:
+            set_with_trains.update(self.dict_with_occupied_tiles.get(block_tile_id, ()))
+        if set_with_trains:
+            self.dict_with_block_trains[block_id] = set_with_trains
+        return block_id
+
+    def invalidate_blocks(self, list_with_tiles: list[int]):
+        """Remove blocks of the changed tiles and of the tiles connected to them by track
+        (they are built again on the first use).
+        Callers also increment topology_version - boundaries of blocks are part of the snapshot of the topology."""
+        set_with_tiles = set(list_with_tiles)
+        for tile_id in list_with_tiles:
+            set_with_tiles.update(self.dict_with_tiles.get_tracks(tile_id))
+        for tile_id in set_with_tiles:
+            block_id = self.dict_with_tile_blocks.get(tile_id)
+            if block_id is None: continue
+            for block_tile_id in self.dict_with_block_tiles.pop(block_id):
+                del self.dict_with_tile_blocks[block_tile_id]
+            self.dict_with_block_trains.pop(block_id, None)
+            for edge in self.dict_with_block_edges.pop(block_id, ()):
+                self.dict_with_route_edges.pop(edge, None)
+
+    def get_chain_tiles(self, tile_id: int) -> list[int]:
+        """Return IDs of tiles of the block with the tile."""
+        return self.dict_with_block_tiles[self.get_block_id(tile_id)]
+
+    def get_trains_in_block(self, block_id: int) -> set[int]:
+        """Return IDs of trains in the block."""
+        return self.dict_with_block_trains.get(block_id, set())
 
     def create_station(self, origin_coord_id: tuple[int, int], angle: int = 0, number_of_tracks: int = 4, number_of_tiles: int = 10):
         """Create tiles with station.
@@ -407,13 +709,178 @@ class Map:
                     tracks_list = [self.lowest_free_id - 1]
                 else:
                     tracks_list = [self.lowest_free_id - 1, self.lowest_free_id + 1]
-                self.dict_with_tiles[self.lowest_free_id] = Tile(self.lowest_free_id, coord_id, self.id2world(coord_id), tracks_list, terrain, device)
+                # the tile created first keeps the coordinates (as with the previous linear search)
+                self.dict_with_tiles.add(self.lowest_free_id, coord_id, self.id2world(coord_id), tracks_list, terrain, device)
                 # semaphores
                 if tile == 1:
                     self.dict_with_tiles[self.lowest_free_id].add_semaphore(angle + 180)
                 if tile == number_of_tiles+2:
                     self.dict_with_tiles[self.lowest_free_id].add_semaphore(angle)
                 self.lowest_free_id += 1
+        # ports
+        for tile_id in range(self.lowest_free_id - number_of_tracks * (number_of_tiles + 4), self.lowest_free_id):
+            self.update_ports_around(tile_id)
+            self.set_with_changed_tiles.add(tile_id)
+            self.layer.invalidate_tile(self.dict_with_tiles[tile_id].coord_world)
+        self.invalidate_blocks(list(range(self.lowest_free_id - number_of_tracks * (number_of_tiles + 4), self.lowest_free_id)))
+        self.topology_version += 1
+
+    # ----- MAP FILE ----------------------------------
+
+    def save(self, path: str):
+        """Save the map to the binary map file."""
+        save_map_file(path, self.dict_with_tiles, self.tile_edge_length, self.lowest_free_id)
+
+    def load(self, path: str):
+        """Replace the map with the one loaded from the binary map file.
+        Trains have to be removed before loading.
+        Chunks are indexed on the first use (as the unloaded ones), tables of ports are built on the first use."""
+        data = load_map_file(path, self.chunk_size)
+        self.tile_edge_length = data["tile_edge_length"]
+        self.outer_tile_radius = self.tile_edge_length
+        self.inner_tile_radius = self.tile_edge_length * SQRT3 / 2
+        self.dict_with_tiles = data["tile_store"]
+        self.lowest_free_id = data["lowest_free_id"]
+        self.dict_with_chunk_trains = {}
+        self.dict_with_train_chunks = {}
+        self.dict_with_ports = {}
+        self.set_with_changed_tiles = set()
+        self.dict_with_path_dependencies = {}
+        self.dict_with_train_dependencies = {}
+        self.dict_with_reservations = {}
+        self.dict_with_occupied_tiles = {}
+        self.dict_with_tile_blocks = {}
+        self.dict_with_block_tiles = {}
+        self.dict_with_block_trains = {}
+        self.dict_with_route_edges = {}
+        self.dict_with_block_edges = {}
+        self.topology_version += 1
+        self.layer.clear()
+        self.set_with_unloaded_chunks = set(self.dict_with_tiles.dict_with_chunks)
+        self.dict_with_loaded_chunks = OrderedDict()
+        self.dict_with_tiles.chunk_loader = self.load_chunk
+
+    # ----- ROUTE POOL ----------------------------------
+
+    def enable_route_pool(self, number_of_workers: int = None, batch_size: int = 32, min_number_of_queries: int = 16):
+        """Enable searching routes of trains in the pool of worker processes
+        (number_of_workers = None - one process per core)."""
+        self.route_pool = RoutePool(number_of_workers, batch_size, min_number_of_queries)
+
+    def disable_route_pool(self):
+        """Stop the worker processes searching routes - routes are searched by the map again."""
+        if self.route_pool is not None:
+            self.route_pool.close()
+            self.route_pool = None
+
+    def get_route_snapshot(self) -> dict:
+        """Return the read-only snapshot of the track topology (arguments of RouteSnapshot):
+        tables of ports, ordinal coordinates, tracks and boundaries of blocks of all tiles with tracks,
+        including the unloaded ones."""
+        exists = np.frombuffer(self.dict_with_tiles.exists, np.uint8)
+        track_0 = np.frombuffer(self.dict_with_tiles.track_0, np.int32)
+        list_with_tile_ids = np.flatnonzero((exists != 0) & (track_0 != 0)).tolist()
+        del exists, track_0
+        dict_with_ports = {}
+        dict_with_coord_ids = {}
+        dict_with_tracks = {}
+        set_with_boundaries = set()
+        for tile_id in list_with_tile_ids:
+            ports = self.dict_with_ports.get(tile_id)
+            dict_with_ports[tile_id] = ports if ports is not None else self.calculate_ports(tile_id)
+            dict_with_coord_ids[tile_id] = self.dict_with_tiles.get_coord_id(tile_id)
+            dict_with_tracks[tile_id] = self.dict_with_tiles.get_tracks(tile_id)
+            if self.is_block_boundary(tile_id):
+                set_with_boundaries.add(tile_id)
+        return {"dict_with_ports": dict_with_ports, "dict_with_coord_ids": dict_with_coord_ids,
+                "dict_with_tracks": dict_with_tracks, "set_with_boundaries": set_with_boundaries}
+
+    # ----- CHUNK STORAGE ----------------------------------
+
+    def enable_chunk_storage(self, directory: str, max_loaded_chunks: int = 256, chunk_generator=None):
+        """Enable unloading of chunks to the directory on disk.
+        At most max_loaded_chunks chunks are kept in memory (if they are not required).
+        Chunk generator is called for the required chunks which have never existed."""
+        os.makedirs(directory, exist_ok=True)
+        self.chunk_storage_directory = directory
+        self.max_loaded_chunks = max_loaded_chunks
+        self.chunk_generator = chunk_generator
+        self.dict_with_loaded_chunks = OrderedDict.fromkeys(self.get_loaded_chunks())
+        self.dict_with_tiles.chunk_loader = self.load_chunk
+
+    def get_loaded_chunks(self) -> list[tuple[int, int]]:
+        """Return chunks with tiles in memory."""
+        return [chunk for chunk in self.dict_with_tiles.dict_with_chunks if chunk not in self.set_with_unloaded_chunks]
+
+    def get_chunk_path(self, chunk: tuple[int, int]) -> str:
+        """Return path of the file with the chunk."""
+        return os.path.join(self.chunk_storage_directory, f"chunk_{chunk[0]}_{chunk[1]}.bin")
+
+    def unload_chunk(self, chunk: tuple[int, int]):
+        """Write tiles of the chunk to disk and remove them from memory
+        (only their coordinates and tracks are kept by the tile store).
+        Tiles are loaded back on the first access."""
+        for tile_id in self.dict_with_tiles.unload_chunk(chunk, self.get_chunk_path(chunk)):
+            self.dict_with_ports.pop(tile_id, None)
+        self.dict_with_loaded_chunks.pop(chunk, None)
+        self.set_with_unloaded_chunks.add(chunk)
+
+    def load_chunk(self, chunk: tuple[int, int]) -> bool:
+        """Read tiles of the chunk from disk (or index tiles of the chunk of the map file).
+        Return True if the chunk was loaded."""
+        if chunk not in self.set_with_unloaded_chunks: return False
+        self.set_with_unloaded_chunks.discard(chunk)
+        list_with_tiles = self.dict_with_tiles.load_chunk(chunk)
+        self.dict_with_loaded_chunks[chunk] = None
+        # tables of ports are rebuilt on the first use
+        for tile_id in list_with_tiles:
+            self.dict_with_ports.pop(tile_id, None)
+            for neighbor_tile_id in self.get_neighbors_id(tile_id):
+                self.dict_with_ports.pop(neighbor_tile_id, None)
+            self.layer.invalidate_tile(self.dict_with_tiles.get_coord_world(tile_id))
+        return True
+
+    def load_all_chunks(self):
+        """Load all unloaded chunks."""
+        for chunk in list(self.set_with_unloaded_chunks):
+            self.load_chunk(chunk)
+
+    def get_required_chunks(self, view_world_rect: tuple[float, float, float, float] = None) -> set[tuple[int, int]]:
+        """Return chunks which have to stay in memory:
+        chunks seen on the screen, chunks with trains and chunks crossed by paths of trains."""
+        set_with_required_chunks = set()
+        if view_world_rect is not None:
+            set_with_required_chunks.update(self.get_chunks_in_world_rect(*view_world_rect))
+        for chunk in self.dict_with_chunk_trains:
+            if self.dict_with_chunk_trains[chunk]:
+                set_with_required_chunks.add(chunk)
+        for tile_id in self.dict_with_path_dependencies:
+            set_with_required_chunks.add(self.get_chunk(self.dict_with_tiles.get_coord_id(tile_id)))
+        return set_with_required_chunks
+
+    def update_chunks(self, set_with_required_chunks: set[tuple[int, int]]):
+        """Load (or generate) the required chunks and unload the least recently required ones
+        if there are more than max_loaded_chunks loaded chunks (only if the chunk storage is enabled)."""
+        for chunk in self.get_loaded_chunks():
+            if chunk not in self.dict_with_loaded_chunks:
+                self.dict_with_loaded_chunks[chunk] = None
+        for chunk in set_with_required_chunks:
+            if chunk in self.set_with_unloaded_chunks:
+                self.load_chunk(chunk)
+            elif chunk not in self.dict_with_tiles.dict_with_chunks and self.chunk_generator is not None:
+                self.chunk_generator(self, chunk)
+                self.dict_with_tiles.get_chunk_columns(chunk)
+            if chunk in self.dict_with_tiles.dict_with_chunks:
+                self.dict_with_loaded_chunks[chunk] = None
+                self.dict_with_loaded_chunks.move_to_end(chunk)
+        # unload chunks over the limit
+        if self.chunk_storage_directory is None: return
+        number_of_chunks_to_unload = len(self.dict_with_loaded_chunks) - self.max_loaded_chunks
+        for chunk in list(self.dict_with_loaded_chunks):
+            if number_of_chunks_to_unload <= 0: break
+            if chunk in set_with_required_chunks or self.dict_with_chunk_trains.get(chunk): continue
+            self.unload_chunk(chunk)
+            number_of_chunks_to_unload -= 1
 
     # ----- SEMAPHORES ----------------------------------
 
@@ -434,11 +901,15 @@ class Map:
             second_neighbor_coord = self.dict_with_tiles[second_neighbor_id].coord_world
             angle = angle_to_target(first_neighbor_coord, second_neighbor_coord)
             self.dict_with_tiles[tile_id].add_semaphore(int(math.degrees(angle)))
+            self.invalidate_blocks([tile_id])
+            self.topology_version += 1
 
     def remove_semaphore(self, tile_id: int):
         """Remove semaphore."""
         if self.dict_with_tiles[tile_id].device == "semaphore":
             self.dict_with_tiles[tile_id].remove_semphore()
+            self.invalidate_blocks([tile_id])
+            self.topology_version += 1
 
     def switch_semaphore(self, tile_id: int):
         """Change light of the semaphore."""
@@ -0,0 +1,90 @@
+import pygame
+import math
+from collections import OrderedDict
+
+from game_engine.definitions import *
+
+
+class MapLayer:
+    def __init__(self, map, block_size: int = 256, max_blocks: int = 400, label_width: int = 300, label_height: int = 30):
+        """Initialization of the cached static layer of the map (terrain and tracks).
+        The layer is pre-rendered separately for each scale into square blocks of block_size pixels,
+        which are rendered on first use and redrawn only when the tiles they show are changed.
+        At most max_blocks blocks are kept (least recently used are removed first)."""
+        self.map = map
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.label_width = label_width # space taken by the tile label on the right side of the tile (in pixels)
+        self.label_height = label_height # space taken by the tile label below the tile (in pixels)
+        self.dict_with_blocks = OrderedDict() # (scale, block_x, block_y) -> Surface
+        self.set_with_scales = set() # scales with rendered blocks
+
+    def draw(self, win, offset_x: float, offset_y: float, scale: float):
+        """Draw the visible blocks of the layer on the screen."""
+        win_width, win_height = win.get_size()
+        # position of the layer origin on the screen
+        origin_x = round(offset_x * scale)
+        origin_y = round(offset_y * scale)
+        for block_x in range(math.floor(-origin_x / self.block_size), math.floor((win_width - origin_x) / self.block_size) + 1):
+            for block_y in range(math.floor(-origin_y / self.block_size), math.floor((win_height - origin_y) / self.block_size) + 1):
+                surface = self.get_block(scale, block_x, block_y)
+                win.blit(surface, (block_x * self.block_size + origin_x, block_y * self.block_size + origin_y))
+
+    def get_block(self, scale: float, block_x: int, block_y: int):
+        """Return the surface with the block - render it if it is not cached."""
+        key = (scale, block_x, block_y)
+        if key in self.dict_with_blocks:
+            self.dict_with_blocks.move_to_end(key)
+            return self.dict_with_blocks[key]
+        surface = self.render_block(scale, block_x, block_y)
+        self.dict_with_blocks[key] = surface
+        self.set_with_scales.add(scale)
+        while len(self.dict_with_blocks) > self.max_blocks:
+            self.dict_with_blocks.popitem(last=False)
+        return surface
+
+    def render_block(self, scale: float, block_x: int, block_y: int):
+        """Render the block with all tiles and tracks which can be seen on it."""
+        surface = pygame.Surface((self.block_size, self.block_size))
+        surface.fill(BLACK)
+        # world coordinates of the block edges
+        left = block_x * self.block_size / scale
+        top = block_y * self.block_size / scale
+        right = (block_x + 1) * self.block_size / scale
+        bottom = (block_y + 1) * self.block_size / scale
+        # tiles lying outside the block can be seen on it too (tracks, labels)
+        margin = 2 * self.map.inner_tile_radius
+        label_margin_x = self.label_width / scale if scale >= 0.5 else 0
+        label_margin_y = self.label_height / scale if scale >= 0.5 else 0
+        for tile_id in self.map.get_tiles_in_world_rect(left - margin - label_margin_x, top - margin - label_margin_y,
+                                                         right + margin, bottom + margin):
+            self.map.draw_tile(surface, tile_id, -left, -top, scale)
+        return surface
+
+    def invalidate_world_rect(self, left: float, top: float, right: float, bottom: float):
+        """Remove from the cache all blocks showing the given part of the world."""
+        margin = 2 * self.map.inner_tile_radius
+        for scale in self.set_with_scales:
+            label_margin_x = self.label_width / scale if scale >= 0.5 else 0
+            label_margin_y = self.label_height / scale if scale >= 0.5 else 0
+            first_block_x = math.floor((left - margin) * scale / self.block_size)
+            last_block_x = math.floor((right + margin + label_margin_x) * scale / self.block_size)
+            first_block_y = math.floor((top - margin) * scale / self.block_size)
+            last_block_y = math.floor((bottom + margin + label_margin_y) * scale / self.block_size)
+            for block_x in range(first_block_x, last_block_x + 1):
+                for block_y in range(first_block_y, last_block_y + 1):
+                    self.dict_with_blocks.pop((scale, block_x, block_y), None)
+
+    def invalidate_tile(self, coord_world: tuple[float, float]):
+        """Remove from the cache all blocks showing the tile with given world coordinates."""
+        self.invalidate_world_rect(coord_world[0], coord_world[1], coord_world[0], coord_world[1])
+
+    def invalidate_track(self, coord_world_1: tuple[float, float], coord_world_2: tuple[float, float]):
+        """Remove from the cache all blocks showing the track between tiles with given world coordinates."""
+        self.invalidate_world_rect(min(coord_world_1[0], coord_world_2[0]), min(coord_world_1[1], coord_world_2[1]),
+                                   max(coord_world_1[0], coord_world_2[0]), max(coord_world_1[1], coord_world_2[1]))
+
+    def clear(self):
+        """Remove all blocks from the cache."""
+        self.dict_with_blocks.clear()
+        self.set_with_scales.clear()
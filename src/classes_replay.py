@@ -0,0 +1,54 @@
+import os
+import time
+
+from classes_map import *
+from classes_simulation import *
+
+
+class Replay:
+    def __init__(self, path: str):
+        """Initialization of the replay of the command log.
+        The simulation is created from the map saved with the log and driven only by the logged commands."""
+        self.header, self.list_with_entries = read_command_log(path)
+        map = Map()
+        map.load(os.path.join(os.path.dirname(os.path.abspath(path)), self.header["map"]))
+        self.simulation = Simulation(map, self.header["ticks_per_path_update"], self.header["use_fleet"])
+        self.simulation.current_tick = self.header["tick"]
+        self.simulation.lowest_free_train_id = self.header["lowest_free_train_id"]
+        self.number_of_checksums = 0
+        self.list_with_divergent_ticks = []
+
+    def step(self):
+        """Run one tick of the simulation."""
+        self.simulation.step()
+
+    def check(self, tick: int, checksum: str):
+        """Compare the state of the simulation with the logged checksum."""
+        self.number_of_checksums += 1
+        if self.simulation.get_checksum() != checksum:
+            self.list_with_divergent_ticks.append(tick)
+
+    def run(self) -> dict:
+        """Replay all logged commands as fast as possible.
+        Checksums are compared in order of the log - between the commands of their tick.
+        Return statistics of the replay with the ticks in which the state diverged from the log."""
+        start_time = time.perf_counter()
+        number_of_commands = 0
+        for entry in self.list_with_entries:
+            while self.simulation.current_tick < entry["tick"]:
+                self.step()
+            if "command" in entry:
+                self.simulation.execute(entry["command"], *entry["args"])
+                number_of_commands += 1
+            elif "checksum" in entry:
+                self.check(entry["tick"], entry["checksum"])
+        elapsed_time = time.perf_counter() - start_time
+        number_of_ticks = self.simulation.current_tick - self.header["tick"]
+        return {
+            "ticks": number_of_ticks,
+            "seconds": elapsed_time,
+            "ticks_per_second": number_of_ticks / elapsed_time if elapsed_time else 0,
+            "commands": number_of_commands,
+            "checksums": self.number_of_checksums,
+            "divergent_ticks": self.list_with_divergent_ticks,
+        }
@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from functions_routing import *
+
+
+# snapshot of the track topology loaded by the worker process: [path of the file, RouteSnapshot]
+worker_snapshot = [None, None]
+
+
+class RouteSnapshot:
+    def __init__(self, dict_with_ports: dict, dict_with_coord_ids: dict, dict_with_tracks: dict, set_with_boundaries: set):
+        """Initialization of the read-only snapshot of the track topology.
+        It holds the tables of ports, ordinal coordinates, tracks and boundaries of blocks of all tiles with tracks,
+        so routes can be searched without the map (e.g. in the worker processes) - with the same search as the map."""
+        self.dict_with_ports = dict_with_ports # tile_id -> {incoming_tile_id: (right_tile_id, center_tile_id, left_tile_id)}
+        self.dict_with_coord_ids = dict_with_coord_ids # tile_id -> coord_id
+        self.dict_with_tracks = dict_with_tracks # tile_id -> list of IDs of connected tiles
+        self.set_with_boundaries = set_with_boundaries # switches, ends of tracks and semaphores
+        self.dict_with_chains = {} # tile_id -> list of IDs of tiles of its chain (built on the first use)
+        self.dict_with_route_edges = {} # (tile_id, next_tile_id) -> edge (built on the first use)
+
+    def get_next_tiles(self, last_tile_id: int, current_tile_id: int) -> tuple[int, int, int]:
+        """Return IDs of the tiles connected by track to the right, center and left
+        (0 if there is no track) for the train coming from the last tile.
+        Raise LookupError if the last tile is not a neighbor (only the map can extrapolate the position)."""
+        ports = self.dict_with_ports.get(current_tile_id)
+        if ports is None: return (0, 0, 0)
+        if last_tile_id in ports: return ports[last_tile_id]
+        raise LookupError(last_tile_id)
+
+    def is_block_boundary(self, tile_id: int) -> bool:
+        """Check if the tile bounds blocks (tiles without tracks also do)."""
+        return tile_id in self.set_with_boundaries or tile_id not in self.dict_with_tracks
+
+    def get_chain_tiles(self, tile_id: int) -> list[int]:
+        """Return IDs of tiles of the chain of tracks with the tile."""
+        if tile_id not in self.dict_with_chains:
+            list_with_tiles = [tile_id]
+            self.dict_with_chains[tile_id] = list_with_tiles
+            index = 0
+            while index < len(list_with_tiles):
+                for track_tile_id in self.dict_with_tracks[list_with_tiles[index]]:
+                    if track_tile_id not in self.dict_with_chains and not self.is_block_boundary(track_tile_id):
+                        self.dict_with_chains[track_tile_id] = list_with_tiles
+                        list_with_tiles.append(track_tile_id)
+                index += 1
+        return self.dict_with_chains[tile_id]
+
+    def get_route_edge(self, tile_id: int, next_tile_id: int) -> tuple:
+        """Return the edge of the contracted routing graph starting with the step from the tile to the next tile."""
+        edge = self.dict_with_route_edges.get((tile_id, next_tile_id))
+        if edge is None:
+            edge = create_route_edge(self, tile_id, next_tile_id)
+            self.dict_with_route_edges[(tile_id, next_tile_id)] = edge
+        return edge
+
+    def get_tile_coord_id(self, tile_id: int) -> tuple[int, int]:
+        """Return ordinal coordinates of the tile."""
+        return self.dict_with_coord_ids[tile_id]
+
+    def find_shortest_route(self, target_tile_id: int, last_tile_id: int, current_tile_id: int):
+        """Search for the shortest train route - the same search as Map.find_shortest_route,
+        so both return the same routes.
+        Return list of IDs of the next tiles up to the target, empty list if there is no route
+        or None if the route has to be searched by the map."""
+        if target_tile_id not in self.dict_with_coord_ids or current_tile_id not in self.dict_with_coord_ids:
+            # trains can not reach tiles without tracks
+            return []
+        try:
+            return search_shortest_route(self, target_tile_id, last_tile_id, current_tile_id)
+        except LookupError:
+            return None
+
+
+def find_routes_in_worker(snapshot_path: str, list_with_queries: list[tuple[int, int, int]]) -> list:
+    """Search routes for the queries (target, last tile, current tile) in the worker process.
+    The snapshot is read from the file only when it changes."""
+    if worker_snapshot[0] != snapshot_path:
+        with open(snapshot_path, "rb") as file:
+            worker_snapshot[:] = [snapshot_path, RouteSnapshot(**pickle.load(file))]
+    return [worker_snapshot[1].find_shortest_route(*query) for query in list_with_queries]
+
+
+class RoutePool:
+    def __init__(self, number_of_workers: int = None, batch_size: int = 32, min_number_of_queries: int = 16):
+        """Initialization of the pool of processes searching routes of trains.
+        The snapshot of the track topology is sent to the workers once per topology version (through the file),
+        then queries are sent in batches of batch_size.
+        Fewer queries than min_number_of_queries are left for the main thread."""
+        self.number_of_workers = number_of_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.min_number_of_queries = min_number_of_queries
+        self.executor = None # started on the first use
+        self.directory = tempfile.TemporaryDirectory(prefix="trains_routes_")
+        self.snapshot_map = None
+        self.snapshot_version = None
+        self.snapshot_path = None
+        self.number_of_snapshots = 0
+
+    def update_snapshot(self, map):
+        """Write the new snapshot of the track topology if the topology of the map has changed."""
+        if map is self.snapshot_map and map.topology_version == self.snapshot_version: return
+        self.number_of_snapshots += 1
+        snapshot_path = os.path.join(self.directory.name, f"snapshot_{self.number_of_snapshots}.pickle")
+        with open(snapshot_path, "wb") as file:
+            pickle.dump(map.get_route_snapshot(), file, pickle.HIGHEST_PROTOCOL)
+        if self.snapshot_path is not None:
+            os.remove(self.snapshot_path)
+        self.snapshot_map = map
+        self.snapshot_version = map.topology_version
+        self.snapshot_path = snapshot_path
+
+    def find_routes(self, map, list_with_queries: list[tuple[int, int, int]]) -> list:
+        """Search routes for the queries (target, last tile, current tile) in the worker processes.
+        Return list of routes in order of the queries (None if the route has to be searched by the map)."""
+        self.update_snapshot(map)
+        if self.executor is None:
+            # spawned workers do not inherit the state of the game (pygame, the map) from the main process
+            self.executor = ProcessPoolExecutor(self.number_of_workers, mp_context=multiprocessing.get_context("spawn"))
+        list_with_futures = [self.executor.submit(find_routes_in_worker, self.snapshot_path, list_with_queries[i:i + self.batch_size])
+                                for i in range(0, len(list_with_queries), self.batch_size)]
+        list_with_routes = []
+        for future in list_with_futures:
+            list_with_routes += future.result()
+        return list_with_routes
+
+    def find_movement_whole_paths(self, map, list_with_trains: list):
+        """Find entire routes to the current targets of the trains in the worker processes.
+        Trains whose routes were not found keep their paths outdated."""
+        list_with_trains = [train for train in list_with_trains if len(train.movement_target)]
+        if len(list_with_trains) < self.min_number_of_queries: return
+        list_with_queries = [(train.movement_target[0], train.last_tile_id, train.tile_id) for train in list_with_trains]
+        for train, route in zip(list_with_trains, self.find_routes(map, list_with_queries)):
+            if route is not None:
+                train.movement_whole_path = route
+                train.path_outdated = False
+
+    def close(self):
+        """Stop the worker processes and remove the snapshot."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.directory.cleanup()
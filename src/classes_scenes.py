@@ -5,6 +5,7 @@ from game_engine.scenes import *
 from game_engine.scenes_features import *
 from classes_map import *
 from classes_trains import *
+from classes_simulation import *
 
 
 class TitleScene(SceneBase):
@@ -60,7 +61,7 @@ class TitleScene(SceneBase):
         self.exit_button.check_hovering(mouse_coord)
 
         self.current_frame += 1
-        if self.current_frame == FRAMERATE:
+        if self.current_frame == TICKRATE:
             self.current_frame = 0
             self.seconds_since_start += 1
 
@@ -115,10 +116,10 @@ class GameScene(SceneBase):
         # display variables
         self.scale = 0.5
         self.offset_horizontal, self.offset_vertical = 500, 500
+        self.path_overlay_mode = PATH_OVERLAY_MODE # paths of trains drawn: "all", "selected" or "none"
         # self.show_extra_data = False
         # self.show_movement_target = False
         # self.pause = False
-        self.current_frame = 0
 
         # create mode buttons
         mode_list = ["none", "terrain", "tracks", "semaphores", "trains", "targets"]
@@ -143,16 +144,30 @@ class GameScene(SceneBase):
         self.right_mouse_button_down = False
         self.last_used_tile = 0
 
-        # initialize the map
-        self.map = Map()
+        # initialize the simulation with the map and trains
+        self.simulation = Simulation(use_fleet=USE_FLEET)
+        self.map = self.simulation.map
+        if MAP_FILE is not None:
+            self.map.load(MAP_FILE)
+        if CHUNK_STORAGE_DIRECTORY is not None:
+            self.map.enable_chunk_storage(CHUNK_STORAGE_DIRECTORY, MAX_LOADED_CHUNKS)
+        if ROUTE_WORKERS:
+            self.map.enable_route_pool(ROUTE_WORKERS)
+        if COMMAND_LOG_FILE is not None:
+            self.simulation.start_command_log(COMMAND_LOG_FILE)
+        self.dict_with_trains = self.simulation.dict_with_trains
         self.current_selected_train_id = 0
-        self.lowest_free_train_id = 1
-
-        # create initial test trains
-        self.dict_with_trains = {}
 
         # TODO: check and remove
         self.list_with_windows = []
+
+    def switch_scene(self, next_scene):
+        """Change scene - the command log is closed and the worker processes searching routes are stopped
+        when the game is left."""
+        if next_scene is not self:
+            self.simulation.stop_command_log()
+            self.map.disable_route_pool()
+        super().switch_scene(next_scene)
     
 
     def process_input(self, events, keys_pressed):
@@ -189,28 +204,30 @@ class GameScene(SceneBase):
                                 self.current_terrain = terrain_button.option
                     # semaphores
                     if self.current_mode == "none" and not button_was_pressed and current_tile_id:
-                        self.map.switch_semaphore(current_tile_id)
+                        self.simulation.execute("switch_semaphore", current_tile_id)
                     if self.current_mode == "semaphores" and not button_was_pressed and current_tile_id:
-                        self.map.manage_semaphore(current_tile_id)
-                        self.map.calculate_trains_path(self.dict_with_trains)
+                        self.simulation.execute("manage_semaphore", current_tile_id)
+                        self.simulation.execute("calculate_trains_path")
                     # choose train
-                    for i, train_id in enumerate(self.dict_with_trains):
-                        if self.dict_with_trains[train_id].is_button_pressed(mouse_pos, i):
+                    for i, train_id in enumerate(list(self.dict_with_trains)):
+                        pressed_button = self.dict_with_trains[train_id].get_pressed_button(mouse_pos, i)
+                        if pressed_button is not None:
                             button_was_pressed += True
                             self.current_selected_train_id = train_id
+                        if pressed_button == "loop":
+                            self.simulation.execute("set_run_in_loop", train_id, not self.dict_with_trains[train_id].run_in_loop)
                     # add trains
                     if self.current_mode == "trains" and not button_was_pressed:
                         tile_1, tile_2 = self.map.get_track_by_coord_world(coord_world)
                         if tile_1 and tile_2:
-                            self.dict_with_trains[self.lowest_free_train_id] = Train(self.map, self.lowest_free_train_id, tile_1, tile_2)
-                            self.lowest_free_train_id += 1
-                            self.map.calculate_trains_path(self.dict_with_trains)
+                            self.simulation.execute("add_train", tile_1, tile_2)
+                            self.simulation.execute("calculate_trains_path")
                     # add targets
                     if self.current_mode == "targets" and not button_was_pressed and \
                                 self.current_selected_train_id in self.dict_with_trains:
-                        self.dict_with_trains[self.current_selected_train_id].movement_target.append(current_tile_id)
+                        self.simulation.execute("add_target", self.current_selected_train_id, current_tile_id)
                         # calculate trains paths
-                        self.map.calculate_trains_path(self.dict_with_trains)
+                        self.simulation.execute("calculate_trains_path")
                     
                     if not button_was_pressed:
                         self.left_mouse_button_down = True
@@ -220,15 +237,15 @@ class GameScene(SceneBase):
                 if event.button == 3:
                     # semaphores
                     if self.current_mode == "semaphores" and current_tile_id:
-                        self.map.remove_semaphore(current_tile_id)
-                        self.map.calculate_trains_path(self.dict_with_trains)
+                        self.simulation.execute("remove_semaphore", current_tile_id)
+                        self.simulation.execute("calculate_trains_path")
                     # remove targets
                     if self.current_mode == "targets":
                         if self.current_selected_train_id in self.dict_with_trains and \
                                 current_tile_id in self.dict_with_trains[self.current_selected_train_id].movement_target:
-                            self.dict_with_trains[self.current_selected_train_id].movement_target.remove(current_tile_id)
+                            self.simulation.execute("remove_target", self.current_selected_train_id, current_tile_id)
                             # calculate trains paths
-                            self.map.calculate_trains_path(self.dict_with_trains)
+                            self.simulation.execute("calculate_trains_path")
                     # remove trains
                     if self.current_mode == "trains":
                         trains_to_del = []
@@ -237,8 +254,8 @@ class GameScene(SceneBase):
                                              or self.dict_with_trains[train_id].tile_id == current_tile_id:
                                 trains_to_del.append(train_id)
                         for remove_train_id in trains_to_del:
-                            del self.dict_with_trains[remove_train_id]
-                        self.map.calculate_trains_path(self.dict_with_trains)
+                            self.simulation.execute("remove_train", remove_train_id)
+                        self.simulation.execute("calculate_trains_path")
 
                     else:
                         self.right_mouse_button_down = True
@@ -302,6 +319,9 @@ class GameScene(SceneBase):
                 if event.key == pygame.K_c:
                     self.scale = 1
                     self.offset_horizontal, self.offset_vertical = 0, 0
+                # paths of trains - all, selected, none
+                if event.key == pygame.K_p:
+                    self.path_overlay_mode = PATH_OVERLAY_MODES[(PATH_OVERLAY_MODES.index(self.path_overlay_mode) + 1) % len(PATH_OVERLAY_MODES)]
 
     # keys that can be pressed multiple times
         # move
@@ -326,11 +346,11 @@ class GameScene(SceneBase):
         if self.left_mouse_button_down and (not current_tile_id or self.last_used_tile != current_tile_id):
             # add new tile
             if self.current_mode == "terrain" or (self.current_mode =="tracks" and not current_tile_id):
-                current_tile_id = self.map.add_tile(coord_id, self.current_terrain)
+                current_tile_id = self.simulation.execute("add_tile", coord_id, self.current_terrain)
             # add new track
             if self.current_mode == "tracks" and self.last_used_tile and current_tile_id:
-                self.map.add_track(self.last_used_tile, current_tile_id)
-                self.map.calculate_trains_path(self.dict_with_trains)
+                self.simulation.execute("add_track", self.last_used_tile, current_tile_id)
+                self.simulation.execute("calculate_trains_path")
 
             self.last_used_tile = current_tile_id
         # removing entities
@@ -338,24 +358,19 @@ class GameScene(SceneBase):
             # remove tile
             if self.current_mode == "terrain" and current_tile_id:
                 # remove tile from train variables
-                self.map.remove_tile(current_tile_id)
-                self.map.calculate_trains_path(self.dict_with_trains)
+                self.simulation.execute("remove_tile", current_tile_id)
+                self.simulation.execute("calculate_trains_path")
             # remove tracks
             if self.current_mode == "tracks" and current_tile_id:
                 tile_1, tile_2 = self.map.get_track_by_coord_world(coord_world)
                 if tile_1 and tile_2:
                     # remove tile from train variables
-                    self.map.remove_track(tile_1, tile_2)
-                    self.map.calculate_trains_path(self.dict_with_trains)
+                    self.simulation.execute("remove_track", tile_1, tile_2)
+                    self.simulation.execute("calculate_trains_path")
         
     def update(self):
         """Game logic for the scene."""
 
-        # count tics
-        self.current_frame += 1
-        if self.current_frame == FRAMERATE: # // 10:
-            self.current_frame = 0
-
         # check hovering of the mouse
         mouse_coord = pygame.mouse.get_pos()
         for mode_button in self.list_with_mode_buttons:
@@ -365,14 +380,7 @@ class GameScene(SceneBase):
                 terrain_button.check_hovering(mouse_coord)
 
         # run the simulation
-        if not self.current_frame:
-            
-            # calculate trains free paths
-            self.map.calculate_trains_path(self.dict_with_trains)
-
-        # run trains
-        for train_id in self.dict_with_trains:
-            self.dict_with_trains[train_id].run(self.map, self.dict_with_trains)
+        self.simulation.step()
 
     # # run the simulation
     #     if not self.pause:
@@ -397,22 +405,44 @@ class GameScene(SceneBase):
         """Draw scene on the screen."""
 
         # clear screen
+        frame_timer.start("render_map")
         win.fill(BLACK)
 
+        # update trains moved by the fleet
+        self.simulation.sync_trains()
+
+        # load chunks seen on the screen and unload unused ones
+        if self.map.chunk_storage_directory is not None or self.map.set_with_unloaded_chunks:
+            self.map.update_chunks(self.map.get_required_chunks(
+                self.map.get_view_world_rect(win, self.offset_horizontal, self.offset_vertical, self.scale)))
+
         # draw the map
         self.map.draw(win, self.offset_horizontal, self.offset_vertical, self.scale)
         if self.current_mode == "tracks" and self.scale >= 0.25:
             self.map.draw_grid(win, self.offset_horizontal, self.offset_vertical, self.scale)
-
-        # draw trains
+        frame_timer.stop("render_map")
+
+        # draw trains (only trains in visible chunks)
+        frame_timer.start("render_trains")
+        if self.path_overlay_mode == "all":
+            for train_id in self.dict_with_trains:
+                self.dict_with_trains[train_id].draw_path(win, self.map, self.offset_horizontal, self.offset_vertical, self.scale)
+        elif self.path_overlay_mode == "selected" and self.current_selected_train_id in self.dict_with_trains:
+            self.dict_with_trains[self.current_selected_train_id].draw_path(win, self.map, self.offset_horizontal, self.offset_vertical, self.scale)
         for train_id in self.dict_with_trains:
-            self.dict_with_trains[train_id].draw(win, self.map, self.offset_horizontal, self.offset_vertical, self.scale)
+            self.dict_with_trains[train_id].draw_trace(win, self.offset_horizontal, self.offset_vertical, self.scale)
+        view_world_rect = self.map.get_view_world_rect(win, self.offset_horizontal, self.offset_vertical, self.scale, 
+                                                        2 * self.map.inner_tile_radius + 300 / self.scale)
+        for train_id in self.map.get_trains_in_world_rect(*view_world_rect):
+            self.dict_with_trains[train_id].draw(win, self.map, self.offset_horizontal, self.offset_vertical, self.scale, self.interpolation)
         for i, train_id in enumerate(self.dict_with_trains):
             self.dict_with_trains[train_id].draw_button(win, i)
             if train_id == self.current_selected_train_id:
                 self.dict_with_trains[train_id].draw_button_selection(win, i)
+        frame_timer.stop("render_trains")
 
         # draw top layer of the map
+        frame_timer.start("render_ui")
         self.map.draw_semaphore(win, self.offset_horizontal, self.offset_vertical, self.scale)
         
         # draw buttons
@@ -421,6 +451,7 @@ class GameScene(SceneBase):
         if self.current_mode == "terrain":
             for terrain_button in self.list_with_terrain_buttons:
                 terrain_button.draw(win)
+        frame_timer.stop("render_ui")
 
     # # draw UI
     #     # draw UI windows
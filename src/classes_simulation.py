@@ -0,0 +1,189 @@
+import os
+import random
+import time
+import hashlib
+
+from settings import *
+from classes_map import *
+from classes_trains import *
+from classes_fleet import *
+from classes_command_log import *
+from game_engine.frame_timer import frame_timer
+
+
+# commands changing the world - run by Simulation.execute and written to the command log
+MAP_COMMANDS = ["add_tile", "remove_tile", "add_track", "remove_track", "manage_semaphore", "remove_semaphore", "switch_semaphore"]
+TRAIN_COMMANDS = ["add_target", "remove_target", "set_run_in_loop"] # the first argument is ID of the train
+SIMULATION_COMMANDS = ["add_train", "remove_train", "calculate_trains_path"]
+
+
+class Simulation:
+    def __init__(self, map=None, ticks_per_path_update: int = TICKRATE, use_fleet: bool = False):
+        """Initialization of the simulation.
+        The simulation does not need display, so it can be run without rendering.
+        If use_fleet is True, trains are moved by the vectorized Fleet."""
+        self.map = map if map is not None else Map()
+        self.dict_with_trains = {}
+        self.fleet = Fleet() if use_fleet else None
+        self.lowest_free_train_id = 1
+        self.ticks_per_path_update = ticks_per_path_update
+        self.current_tick = 0
+        self.command_log = None
+        self.checksum_interval = 0
+
+    def add_train(self, tile_id: int, last_tile_id: int) -> int:
+        """Add new train.
+        Return ID of the created train."""
+        train_id = self.lowest_free_train_id
+        self.dict_with_trains[train_id] = Train(self.map, train_id, tile_id, last_tile_id, TRACE_LENGTH, TRACE_SAMPLING)
+        if self.fleet is not None:
+            self.fleet.add_train(self.map, self.dict_with_trains[train_id])
+        self.lowest_free_train_id += 1
+        return train_id
+
+    def remove_train(self, train_id: int):
+        """Remove train."""
+        self.map.release_tile(train_id, self.dict_with_trains[train_id].tile_id)
+        if self.fleet is not None:
+            self.fleet.remove_train(train_id)
+        del self.dict_with_trains[train_id]
+
+    def calculate_trains_path(self):
+        """Calculate paths of all trains."""
+        self.map.calculate_trains_path(self.dict_with_trains)
+
+    def execute(self, command: str, *args):
+        """Run the command changing the world (see MAP_COMMANDS, TRAIN_COMMANDS and SIMULATION_COMMANDS)
+        and write it to the command log.
+        Return the result of the command."""
+        if self.command_log is not None:
+            self.command_log.write_command(self.current_tick, command, args)
+        if command in MAP_COMMANDS:
+            return getattr(self.map, command)(*args)
+        elif command in TRAIN_COMMANDS:
+            train = self.dict_with_trains[args[0]]
+            if self.fleet is not None:
+                self.fleet.events_outdated = True # e.g. the new target can be the tile of the train
+            if command == "set_run_in_loop":
+                train.run_in_loop = args[1]
+                return
+            return getattr(train, command)(*args[1:])
+        elif command in SIMULATION_COMMANDS:
+            return getattr(self, command)(*args)
+        raise ValueError(f"unknown command: {command}")
+
+    def start_command_log(self, path: str, checksum_interval: int = TICKRATE):
+        """Start writing commands and checksums of the state to the command log.
+        The current map is saved next to the log, so the log can be replayed from the beginning."""
+        if len(self.dict_with_trains):
+            raise ValueError("the command log has to be started before adding trains")
+        map_path = path + ".map"
+        self.map.save(map_path)
+        self.command_log = CommandLog(path)
+        self.command_log.write_header({
+            "map": os.path.basename(map_path),
+            "tick": self.current_tick,
+            "ticks_per_path_update": self.ticks_per_path_update,
+            "use_fleet": self.fleet is not None,
+            "lowest_free_train_id": self.lowest_free_train_id,
+            "checksum_interval": checksum_interval,
+        })
+        self.checksum_interval = checksum_interval
+
+    def stop_command_log(self):
+        """Stop writing the command log (the final checksum marks the end of the log)."""
+        if self.command_log is not None:
+            self.command_log.write_checksum(self.current_tick, self.get_checksum())
+            self.command_log.close()
+            self.command_log = None
+
+    def get_checksum(self) -> str:
+        """Return checksum of the state of the trains (and of the counters of the map)."""
+        if self.fleet is not None:
+            for index, train_id in enumerate(self.fleet.list_with_train_ids):
+                self.fleet.store_train(self.dict_with_trains[train_id], index)
+        checksum = hashlib.sha1(repr((self.map.lowest_free_id, self.map.paths_version)).encode())
+        for train_id in sorted(self.dict_with_trains):
+            train = self.dict_with_trains[train_id]
+            checksum.update(repr((train_id, train.tile_id, train.last_tile_id, train.coord_world, train.angle, 
+                                  train.v_current, train.state, train.movement_target, train.movement_free_path)).encode())
+        return checksum.hexdigest()
+
+    def add_random_trains(self, number_of_trains: int, number_of_targets: int = 2, run_in_loop: bool = True) -> list[int]:
+        """Place trains on random free tracks and give them targets lying ahead of them.
+        Return IDs of the created trains."""
+        self.map.load_all_chunks()
+        list_with_free_tiles = [tile_id for tile_id in self.map.dict_with_tiles \
+                                    if len(self.map.dict_with_tiles[tile_id].list_with_tracks) \
+                                    and not self.map.get_trains_on_tile(tile_id)]
+        random.shuffle(list_with_free_tiles)
+        list_with_new_trains = []
+        for tile_id in list_with_free_tiles[:number_of_trains]:
+            last_tile_id = random.choice(self.map.dict_with_tiles[tile_id].list_with_tracks)
+            train_id = self.execute("add_train", tile_id, last_tile_id)
+            self.execute("set_run_in_loop", train_id, run_in_loop)
+            # walk along the tracks and choose targets
+            last_tile_id, current_tile_id = last_tile_id, tile_id
+            for _ in range(number_of_targets):
+                for _ in range(random.randint(5, 30)):
+                    list_with_next_tiles = [next_tile_id for next_tile_id in self.map.get_next_tiles(last_tile_id, current_tile_id) if next_tile_id]
+                    if not len(list_with_next_tiles): break
+                    last_tile_id, current_tile_id = current_tile_id, random.choice(list_with_next_tiles)
+                if current_tile_id != tile_id:
+                    self.execute("add_target", train_id, current_tile_id)
+            list_with_new_trains.append(train_id)
+        self.execute("calculate_trains_path")
+        return list_with_new_trains
+
+    def step(self):
+        """Run one tick of the simulation."""
+        self.current_tick += 1
+
+        # calculate trains free paths
+        if not self.current_tick % self.ticks_per_path_update:
+            frame_timer.start("update_paths")
+            self.map.calculate_trains_path(self.dict_with_trains)
+            # unload chunks not used by trains
+            if self.map.chunk_storage_directory is not None or self.map.set_with_unloaded_chunks:
+                self.map.update_chunks(self.map.get_required_chunks())
+            frame_timer.stop("update_paths")
+
+        # run trains
+        frame_timer.start("update_trains")
+        if self.fleet is not None:
+            self.fleet.run(self.map, self.dict_with_trains)
+        else:
+            for train_id in self.dict_with_trains:
+                self.dict_with_trains[train_id].run(self.map, self.dict_with_trains)
+        frame_timer.stop("update_trains")
+
+        # write checksum of the state
+        if self.command_log is not None and not self.current_tick % self.checksum_interval:
+            self.command_log.write_checksum(self.current_tick, self.get_checksum())
+
+    def sync_trains(self):
+        """Update train objects with the state of the fleet (e.g. before drawing)."""
+        if self.fleet is not None:
+            self.fleet.sync_trains(self.dict_with_trains)
+
+    def run(self, number_of_ticks: int) -> dict:
+        """Run the simulation for the given number of ticks as fast as possible.
+        Return statistics of the run."""
+        start_time = time.perf_counter()
+        for _ in range(number_of_ticks):
+            self.step()
+        elapsed_time = time.perf_counter() - start_time
+        self.sync_trains()
+
+        dict_with_states = {}
+        for train_id in self.dict_with_trains:
+            state = self.dict_with_trains[train_id].state
+            dict_with_states[state] = dict_with_states.get(state, 0) + 1
+        return {
+            "ticks": number_of_ticks,
+            "seconds": elapsed_time,
+            "ticks_per_second": number_of_ticks / elapsed_time if elapsed_time else 0,
+            "trains": len(self.dict_with_trains),
+            "tiles": len(self.map.dict_with_tiles),
+            "states": dict_with_states,
+        }
@@ -0,0 +1,521 @@
+import pygame
+import math
+import random
+import struct
+from array import array
+
+from game_engine.definitions import *
+from game_engine.functions_math import *
+from game_engine.text_cache import text_cache
+
+
+# codes of the values kept in the columns of the tile store
+TERRAIN_TYPES = ["grass", "water", "shallow", "sand", "snow", "mars", "forest", "snow_forest", "concrete", "submerged_concrete"]
+TERRAIN_CODES = {terrain: code for code, terrain in enumerate(TERRAIN_TYPES)}
+DEVICE_TYPES = ["rail", "station", "semaphore"]
+DEVICE_CODES = {device: code for code, device in enumerate(DEVICE_TYPES)}
+SEMAPHORE_LIGHTS = ["red", "green"]
+SEMAPHORE_LIGHT_CODES = {light: code for code, light in enumerate(SEMAPHORE_LIGHTS)}
+MAX_TRACKS = 3
+
+
+class TileChunk:
+    def __init__(self, dict_with_columns: dict, number: int, size: int = 0):
+        """Initialization of the columns of the tiles of one chunk (size x size tiles).
+        The number of the chunk and the slot of the tile in the columns are kept by the tile store.
+        Columns are dropped from memory when the chunk is written to disk, the index of coordinates is kept."""
+        self.dict_with_columns = dict_with_columns
+        self.number = number
+        self.path = None # file with the columns written to disk
+        self.coord_tile_ids = array("i", bytes(4 * size * size)) # ID of the tile at each ordinal coordinates in the chunk (0 - no tile)
+        self.tile_ids = array("i") # ID of the tile in each slot (0 - removed tile)
+        for name, typecode in dict_with_columns.items():
+            setattr(self, name, array(typecode))
+
+    def is_in_memory(self) -> bool:
+        """Check if the columns are in memory (not only on disk)."""
+        return self.tile_ids is not None
+
+    def get_tile_ids(self) -> list[int]:
+        """Return IDs of the tiles in order of slots."""
+        return [tile_id for tile_id in self.tile_ids if tile_id]
+
+    def write(self, path: str) -> list[int]:
+        """Write the columns to the binary file (column after column, removed tiles are skipped)
+        and drop them from memory.
+        Return IDs of the written tiles."""
+        list_with_slots = [slot for slot, tile_id in enumerate(self.tile_ids) if tile_id]
+        list_with_tile_ids = [self.tile_ids[slot] for slot in list_with_slots]
+        with open(path, "wb") as file:
+            file.write(struct.pack("<I", len(list_with_tile_ids)))
+            file.write(array("i", list_with_tile_ids).tobytes())
+            for name, typecode in self.dict_with_columns.items():
+                column = getattr(self, name)
+                file.write(array(typecode, [column[slot] for slot in list_with_slots]).tobytes())
+        self.path = path
+        self.tile_ids = None
+        for name in self.dict_with_columns:
+            setattr(self, name, None)
+        return list_with_tile_ids
+
+    def read(self, path: str = None):
+        """Read the columns written by write (by default from the file of the chunk).
+        Tiles take slots in order of the file."""
+        with open(path or self.path, "rb") as file:
+            number_of_tiles = struct.unpack("<I", file.read(4))[0]
+            self.tile_ids = array("i")
+            self.tile_ids.frombytes(file.read(self.tile_ids.itemsize * number_of_tiles))
+            for name, typecode in self.dict_with_columns.items():
+                column = array(typecode)
+                column.frombytes(file.read(column.itemsize * number_of_tiles))
+                setattr(self, name, column)
+
+    def get_memory_usage(self) -> int:
+        """Return number of bytes taken by the columns and the index of coordinates in memory."""
+        memory_usage = self.coord_tile_ids.itemsize * len(self.coord_tile_ids)
+        if not self.is_in_memory(): return memory_usage
+        return memory_usage + sum(column.itemsize * len(column) for column in [self.tile_ids] + [getattr(self, name) for name in self.dict_with_columns])
+
+
+class TileStore:
+    def __init__(self, capacity: int = 1024, chunk_size: int = 16):
+        """Initialization of the compact store of tiles.
+        Parameters of the tiles are kept in typed arrays (columns).
+        The store behaves like a dictionary tile_id -> Tile, where Tile is a lightweight view of the tile.
+        Columns of the index and of the track topology are kept for all tiles (the ID of the tile is its slot),
+        so tracks of unloaded tiles can be followed and their coordinates give the chunk (chunk_size x chunk_size tiles).
+        Each chunk keeps the index of coordinates (ordinal coordinates -> tile_id) also when it is unloaded.
+        Other parameters are kept in columns of the chunks, which are dropped from memory when the chunk is unloaded."""
+        self.dict_with_columns = {
+            "exists": "B", # 0 - no tile, 1 - tile in the store, 2 - tile unloaded (kept outside the store)
+            "coord_x": "i", "coord_y": "i",
+            "device": "B",
+            "track_0": "i", "track_1": "i", "track_2": "i", # IDs of connected tiles (0 - no track)
+        }
+        self.dict_with_chunk_columns = {
+            "world_x": "d", "world_y": "d",
+            "terrain": "B", "depth": "b",
+            "color_r": "B", "color_g": "B", "color_b": "B",
+            "semaphore_angle": "h", "semaphore_light": "B",
+        }
+        self.chunk_size = chunk_size
+        self.dict_with_chunks = {} # chunk -> TileChunk
+        self.list_with_chunks = [] # TileChunk by its number
+        self.chunk_number = array("i") # number of the chunk of the tile (the index tile_id -> chunk)
+        self.slot = array("i") # slot of the tile in the columns of its chunk
+        self.capacity = 0
+        self.chunk_loader = None # function loading the chunk written to disk (e.g. by the map) - chunk -> bool
+        for name, typecode in self.dict_with_columns.items():
+            setattr(self, name, array(typecode))
+        self.number_of_tiles = 0
+        self.grow(capacity)
+
+    def grow(self, capacity: int):
+        """Extend the columns to hold at least the given number of slots."""
+        if capacity <= self.capacity: return
+        capacity = max(capacity, 2 * self.capacity)
+        for column in [self.chunk_number, self.slot] + [getattr(self, name) for name in self.dict_with_columns]:
+            column.extend(array(column.typecode, bytes(column.itemsize * (capacity - self.capacity))))
+        self.capacity = capacity
+
+    def add(self, tile_id: int, coord_id: tuple[int, int], coord_world: tuple[float, float],
+                list_with_tracks: list[int] = None, type: str = "grass", device: str = "rail"):
+        """Add the tile in the slot given by its ID (and in the next slot of its chunk)."""
+        if tile_id <= 0: raise ValueError(f"tile ID must be positive: {tile_id}")
+        if tile_id in self: raise KeyError(f"tile already exists: {tile_id}")
+        if type not in TERRAIN_CODES: raise ValueError(f"unknown type of terrain: {type}")
+        self.grow(tile_id + 1)
+        chunk = self.get_chunk_columns(self.get_chunk(coord_id))
+        self.chunk_number[tile_id] = chunk.number
+        self.slot[tile_id] = len(chunk.tile_ids)
+        chunk.tile_ids.append(tile_id)
+        # the tile created first keeps the coordinates
+        index = self.get_coord_index(coord_id)
+        if not chunk.coord_tile_ids[index]:
+            chunk.coord_tile_ids[index] = tile_id
+        for name in self.dict_with_chunk_columns:
+            getattr(chunk, name).append(0)
+        chunk.world_x[-1], chunk.world_y[-1] = coord_world
+        self.exists[tile_id] = 1
+        self.coord_x[tile_id], self.coord_y[tile_id] = coord_id
+        self.device[tile_id] = DEVICE_CODES[device]
+        self.track_0[tile_id] = self.track_1[tile_id] = self.track_2[tile_id] = 0
+        self.number_of_tiles += 1
+        tile = Tile(self, tile_id)
+        tile.set_type(type)
+        for track_tile_id in list_with_tracks or []:
+            tile.add_track(track_tile_id)
+        return tile
+
+    # ----- CHUNKS ----------------------------------
+
+    def get_chunk(self, coord_id: tuple[int, int]) -> tuple[int, int]:
+        """Return the chunk containing the tile with given ordinal coordinates."""
+        return (coord_id[0] // self.chunk_size, coord_id[1] // self.chunk_size)
+
+    def get_coord_index(self, coord_id: tuple[int, int]) -> int:
+        """Return index of the ordinal coordinates in the index of coordinates of their chunk."""
+        return coord_id[0] % self.chunk_size + coord_id[1] % self.chunk_size * self.chunk_size
+
+    def get_tile_id(self, coord_id: tuple[int, int]) -> int:
+        """Return ID of the tile with given ordinal coordinates, also the unloaded one (0 - no tile)."""
+        x_id, y_id = coord_id
+        chunk_size = self.chunk_size
+        chunk_columns = self.dict_with_chunks.get((x_id // chunk_size, y_id // chunk_size))
+        if chunk_columns is None: return 0
+        return chunk_columns.coord_tile_ids[x_id % chunk_size + y_id % chunk_size * chunk_size]
+
+    def get_tile_chunk(self, tile_id: int) -> tuple[int, int]:
+        """Return the chunk containing the tile (also the unloaded one)."""
+        return (self.coord_x[tile_id] // self.chunk_size, self.coord_y[tile_id] // self.chunk_size)
+
+    def get_chunk_columns(self, chunk: tuple[int, int]) -> TileChunk:
+        """Return columns of the chunk (created if the chunk is new, loaded with the chunk_loader if they are on disk)."""
+        chunk_columns = self.dict_with_chunks.get(chunk)
+        if chunk_columns is None:
+            chunk_columns = self.create_chunk(chunk)
+        elif not chunk_columns.is_in_memory():
+            if self.chunk_loader is None or not self.chunk_loader(chunk) or not chunk_columns.is_in_memory():
+                raise KeyError(f"chunk can not be loaded: {chunk}")
+        return chunk_columns
+
+    def create_chunk(self, chunk: tuple[int, int]) -> TileChunk:
+        """Create empty columns of the new chunk."""
+        chunk_columns = TileChunk(self.dict_with_chunk_columns, len(self.list_with_chunks), self.chunk_size)
+        self.dict_with_chunks[chunk] = chunk_columns
+        self.list_with_chunks.append(chunk_columns)
+        return chunk_columns
+
+    def get_chunk_tile_ids(self, chunk: tuple[int, int]) -> list[int]:
+        """Return IDs of the tiles of the chunk (loaded with the chunk_loader if its columns are on disk)."""
+        if chunk not in self.dict_with_chunks: return []
+        return self.get_chunk_columns(chunk).get_tile_ids()
+
+    def get_chunk_slot(self, tile_id: int) -> tuple[TileChunk, int]:
+        """Return columns of the chunk of the tile and the slot of the tile in them."""
+        chunk_columns = self.list_with_chunks[self.chunk_number[tile_id]]
+        if chunk_columns.tile_ids is None:
+            chunk_columns = self.get_chunk_columns(self.get_tile_chunk(tile_id))
+        return chunk_columns, self.slot[tile_id]
+
+    def unload_chunk(self, chunk: tuple[int, int], path: str) -> list[int]:
+        """Write columns of the chunk to the file, drop them from memory and mark tiles of the chunk as unloaded -
+        they will be loaded by the chunk_loader on the first access.
+        Return IDs of the tiles."""
+        chunk_columns = self.dict_with_chunks.get(chunk)
+        if chunk_columns is None:
+            chunk_columns = self.create_chunk(chunk)
+        list_with_tile_ids = chunk_columns.write(path)
+        for tile_id in list_with_tile_ids:
+            if self.exists[tile_id] == 1:
+                self.exists[tile_id] = 2
+                self.number_of_tiles -= 1
+        return list_with_tile_ids
+
+    def load_chunk(self, chunk: tuple[int, int]) -> list[int]:
+        """Read columns of the chunk from its file (if they are not in memory) and mark its tiles as loaded.
+        Return IDs of the tiles."""
+        chunk_columns = self.dict_with_chunks.get(chunk)
+        if chunk_columns is None: return []
+        if not chunk_columns.is_in_memory():
+            chunk_columns.read()
+            for slot, tile_id in enumerate(chunk_columns.tile_ids):
+                self.slot[tile_id] = slot
+        list_with_tile_ids = chunk_columns.get_tile_ids()
+        for tile_id in list_with_tile_ids:
+            if self.exists[tile_id] != 1:
+                self.exists[tile_id] = 1
+                self.number_of_tiles += 1
+        return list_with_tile_ids
+
+    def load(self, tile_id) -> bool:
+        """Load the chunk of the unloaded tile with the chunk_loader.
+        Return True if the tile is in the store."""
+        try:
+            if tile_id <= 0 or self.exists[tile_id] != 2 or self.chunk_loader is None: return False
+        except (IndexError, TypeError):
+            return False
+        self.chunk_loader(self.get_tile_chunk(tile_id))
+        return self.exists[tile_id] == 1
+
+    # ----- PARAMETERS ----------------------------------
+
+    def get_tracks(self, tile_id: int) -> list[int]:
+        """Return IDs of tiles connected by track to the tile."""
+        list_with_tracks = []
+        if self.track_0[tile_id]: list_with_tracks.append(self.track_0[tile_id])
+        if self.track_1[tile_id]: list_with_tracks.append(self.track_1[tile_id])
+        if self.track_2[tile_id]: list_with_tracks.append(self.track_2[tile_id])
+        return list_with_tracks
+
+    def get_number_of_tracks(self, tile_id: int) -> int:
+        """Return number of tracks connected to the tile."""
+        return (self.track_0[tile_id] != 0) + (self.track_1[tile_id] != 0) + (self.track_2[tile_id] != 0)
+
+    def set_tracks(self, tile_id: int, list_with_tracks: list[int]):
+        """Set IDs of tiles connected by track to the tile."""
+        if len(list_with_tracks) > MAX_TRACKS:
+            raise ValueError(f"tile {tile_id} can not have more than {MAX_TRACKS} tracks")
+        list_with_tracks = list(list_with_tracks) + [0] * (MAX_TRACKS - len(list_with_tracks))
+        self.track_0[tile_id], self.track_1[tile_id], self.track_2[tile_id] = list_with_tracks
+
+    def get_coord_id(self, tile_id: int) -> tuple[int, int]:
+        """Return ordinal coordinates of the tile."""
+        return (self.coord_x[tile_id], self.coord_y[tile_id])
+
+    def get_coord_world(self, tile_id: int) -> tuple[float, float]:
+        """Return world coordinates of the tile."""
+        chunk_columns = self.list_with_chunks[self.chunk_number[tile_id]]
+        if chunk_columns.tile_ids is None:
+            chunk_columns = self.get_chunk_columns(self.get_tile_chunk(tile_id))
+        slot = self.slot[tile_id]
+        return (chunk_columns.world_x[slot], chunk_columns.world_y[slot])
+
+    def iter_chunk_columns(self):
+        """Yield columns of all chunks - columns written to disk are read into the temporary TileChunk
+        (the store is not changed)."""
+        for chunk_columns in self.dict_with_chunks.values():
+            if not chunk_columns.is_in_memory():
+                path = chunk_columns.path
+                chunk_columns = TileChunk(self.dict_with_chunk_columns, chunk_columns.number)
+                chunk_columns.read(path)
+            yield chunk_columns
+
+    def get_memory_usage(self) -> int:
+        """Return number of bytes taken by the columns in memory."""
+        return sum(column.itemsize * len(column) for column in [self.chunk_number, self.slot] + [getattr(self, name) for name in self.dict_with_columns]) \
+                + sum(chunk_columns.get_memory_usage() for chunk_columns in self.dict_with_chunks.values())
+
+    # ----- DICTIONARY ----------------------------------
+
+    def get(self, tile_id: int, default=None):
+        if tile_id in self: return Tile(self, tile_id)
+        return default
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        for tile_id in self:
+            yield Tile(self, tile_id)
+
+    def items(self):
+        for tile_id in self:
+            yield tile_id, Tile(self, tile_id)
+
+    def __contains__(self, tile_id) -> bool:
+        try:
+            if tile_id > 0 and self.exists[tile_id] == 1: return True
+        except (IndexError, TypeError):
+            return False
+        return self.load(tile_id)
+
+    def __getitem__(self, tile_id: int):
+        try:
+            if tile_id > 0 and self.exists[tile_id] == 1: return Tile(self, tile_id)
+        except (IndexError, TypeError):
+            pass
+        if self.load(tile_id): return Tile(self, tile_id)
+        raise KeyError(tile_id)
+
+    def __delitem__(self, tile_id: int):
+        if tile_id not in self: raise KeyError(tile_id)
+        chunk_columns, slot = self.get_chunk_slot(tile_id)
+        chunk_columns.tile_ids[slot] = 0
+        index = self.get_coord_index(self.get_coord_id(tile_id))
+        if chunk_columns.coord_tile_ids[index] == tile_id:
+            chunk_columns.coord_tile_ids[index] = 0
+        self.exists[tile_id] = 0
+        self.track_0[tile_id] = self.track_1[tile_id] = self.track_2[tile_id] = 0
+        self.number_of_tiles -= 1
+
+    def __iter__(self):
+        exists = self.exists
+        for tile_id in range(1, self.capacity):
+            if exists[tile_id] == 1: yield tile_id
+
+    def __len__(self) -> int:
+        return self.number_of_tiles
+
+
+# ======================================================================
+
+
+class Tile:
+    __slots__ = ("store", "id")
+
+    def __init__(self, store: TileStore, id: int):
+        """Initialization of the view of the tile kept in the tile store."""
+        self.store = store
+        self.id = id
+
+    @property
+    def coord_id(self) -> tuple[int, int]:
+        return (self.store.coord_x[self.id], self.store.coord_y[self.id])
+
+    @property
+    def coord_world(self) -> tuple[float, float]:
+        return self.store.get_coord_world(self.id)
+
+    @property
+    def type(self) -> str:
+        chunk_columns, slot = self.store.get_chunk_slot(self.id)
+        return TERRAIN_TYPES[chunk_columns.terrain[slot]]
+
+    @property
+    def tile_type(self) -> str:
+        return self.type
+
+    @property
+    def depth(self) -> int:
+        chunk_columns, slot = self.store.get_chunk_slot(self.id)
+        return chunk_columns.depth[slot]
+
+    @property
+    def color(self) -> list[int]:
+        chunk_columns, slot = self.store.get_chunk_slot(self.id)
+        return [chunk_columns.color_r[slot], chunk_columns.color_g[slot], chunk_columns.color_b[slot]]
+
+    @color.setter
+    def color(self, color):
+        chunk_columns, slot = self.store.get_chunk_slot(self.id)
+        chunk_columns.color_r[slot], chunk_columns.color_g[slot], chunk_columns.color_b[slot] = color
+
+    @property
+    def device(self) -> str:
+        return DEVICE_TYPES[self.store.device[self.id]]
+
+    @device.setter
+    def device(self, device: str):
+        self.store.device[self.id] = DEVICE_CODES[device]
+
+    @property
+    def list_with_tracks(self) -> list[int]:
+        return self.store.get_tracks(self.id)
+
+    @property
+    def rail_type(self):
+        """Rail type: None, station, rail, end, switch."""
+        if self.device == "station": return "station"
+        return [None, "end", "rail", "switch"][len(self.list_with_tracks)]
+
+    @property
+    def semaphore_angle(self) -> int:
+        chunk_columns, slot = self.store.get_chunk_slot(self.id)
+        return chunk_columns.semaphore_angle[slot]
+
+    @semaphore_angle.setter
+    def semaphore_angle(self, angle: int):
+        chunk_columns, slot = self.store.get_chunk_slot(self.id)
+        chunk_columns.semaphore_angle[slot] = angle
+
+    @property
+    def semaphore_light(self) -> str:
+        chunk_columns, slot = self.store.get_chunk_slot(self.id)
+        return SEMAPHORE_LIGHTS[chunk_columns.semaphore_light[slot]]
+
+    @semaphore_light.setter
+    def semaphore_light(self, light: str):
+        chunk_columns, slot = self.store.get_chunk_slot(self.id)
+        chunk_columns.semaphore_light[slot] = SEMAPHORE_LIGHT_CODES[light]
+
+    def draw(self, win, offset_x: int, offset_y: int, scale: float):
+        """Draw the Tile on the screen."""
+        coord_screen = world2screen(self.coord_world, offset_x, offset_y, scale)
+        color = self.color
+        # draw background
+        pygame.draw.circle(win, color, coord_screen, 20*scale) # 50
+        # draw label
+        if scale >= 0.5:
+            text_obj = text_cache.render(f"{self.id}-{self.list_with_tracks}", 20, color, BLACK) # {self.coord_id} {self.list_with_tracks}
+            win.blit(text_obj, coord_screen)
+
+    def set_type(self, type, depth=0):
+        """Set color of the tile depending on the type of terrain (one of TERRAIN_TYPES)."""
+        if type not in TERRAIN_CODES: raise ValueError(f"unknown type of terrain: {type}")
+        chunk_columns, slot = self.store.get_chunk_slot(self.id)
+        chunk_columns.terrain[slot] = TERRAIN_CODES[type]
+        chunk_columns.depth[slot] = depth
+        if type == "mars": self.color = [MARS_RED[0] - random.randint(0, 20), MARS_RED[1] + random.randint(0, 20), MARS_RED[2]]
+        elif type == "snow": self.color = [SNOW_WHITE[0] - random.randint(0, 40), SNOW_WHITE[1] - random.randint(0, 10), SNOW_WHITE[2] - random.randint(0, 5)]
+        elif type == "sand": self.color = [SAND[0] - random.randint(0, 15), SAND[1] - random.randint(0, 15), SAND[2] - random.randint(0, 15)]
+        elif type == "grass": self.color = [GRASS[0], GRASS[1] - random.randint(0, 10), GRASS[2] - random.randint(0, 10)]
+        # elif type == "forest": self.color = [GREEN[0], GREEN[1] - random.randint(0, 20), GREEN[2]]
+        elif type == "forest": self.color = [GRASS[0], GRASS[1] - random.randint(0, 10) - 10, GRASS[2] - random.randint(0, 10)]
+        elif type == "snow_forest": self.color = [SNOW_WHITE[0] - random.randint(0, 40) - 20, SNOW_WHITE[1] - random.randint(0, 10) - 10, SNOW_WHITE[2] - random.randint(0, 5)]
+        elif type == "concrete":
+            rand = random.randint(0, 10)
+            self.color = [GRAY[0] - rand, GRAY[1] - rand, GRAY[2] - rand]
+        elif type == "submerged_concrete":
+            rand = random.randint(0, 10)
+            # self.color = [GRAY[0] - rand, GRAY[1] - rand, GRAY[2] - rand]
+            self.color = [SHALLOW[0]- 4 * depth - rand, SHALLOW[1] - 8 * depth - rand, SHALLOW[2] - 8 * depth - rand]
+        elif type == "water":
+            depth -= 5
+            self.color = [WATER[0], WATER[1] - 4 * depth, WATER[2] - 8 * depth]
+        elif type == "shallow":
+            self.color = [SHALLOW[0]- 4 * depth, SHALLOW[1] - 8 * depth, SHALLOW[2] - 8 * depth]
+        else: self.color = RED
+
+    def add_track(self, tile_id: int):
+        """Add rail (up to three rails)."""
+        list_with_tracks = self.list_with_tracks
+        if tile_id not in list_with_tracks:
+            self.store.set_tracks(self.id, list_with_tracks + [tile_id])
+
+    def remove_track(self, tile_id: int):
+        """Remove rail."""
+        list_with_tracks = self.list_with_tracks
+        if tile_id in list_with_tracks:
+            list_with_tracks.remove(tile_id)
+            self.store.set_tracks(self.id, list_with_tracks)
+
+    # ----- SEMAPHORES ----------------------------------
+
+    def draw_semaphore(self, win, offset_x: int, offset_y: int, scale):
+        """Draw semaphore on the screen."""
+        if self.device == "semaphore":
+            semaphore_radius = 20
+            if self.semaphore_light == "red":
+                color = RED
+            elif self.semaphore_light == "green":
+                color = GREEN
+            coord_screen = world2screen(self.coord_world, offset_x, offset_y, scale)
+            pygame.draw.circle(win, WHITE, move_point(coord_screen, -semaphore_radius*scale, math.radians(self.semaphore_angle)), semaphore_radius*scale, 1)
+            pygame.draw.circle(win, WHITE, coord_screen, semaphore_radius*scale, 1)
+            # top light
+            pygame.draw.circle(win, color, move_point(coord_screen, semaphore_radius*scale, math.radians(self.semaphore_angle)), semaphore_radius*scale)
+
+    def add_semaphore(self, angle: int = 60):
+        """Add semaphore.
+        Angle in radians.
+        """
+        if len(self.list_with_tracks) == 2:
+            self.device = "semaphore"
+            self.semaphore_angle = angle
+            self.semaphore_light = "red"
+
+    def remove_semphore(self):
+        """Remove semaphore."""
+        if self.device == "semaphore":
+            self.device = "rail"
+
+    def turn_semaphore(self):
+        """Turn semaphore 180deg."""
+        if self.device == "semaphore":
+            self.semaphore_angle += 180
+            if self.semaphore_angle > 360:
+                self.semaphore_angle -= 360
+
+    def switch_semaphore(self):
+        """Change light of the semaphore."""
+        if self.semaphore_light == "red":
+            self.semaphore_light = "green"
+        elif self.semaphore_light == "green":
+            self.semaphore_light = "red"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Tile) and self.store is other.store and self.id == other.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
@@ -1,22 +1,70 @@
 import pygame
 import math
 import random
+import numpy as np
+from array import array
 
 # from settings import *
 from game_engine.definitions import *
 from game_engine.functions_math import *
+from game_engine.text_cache import text_cache
+
+class TrainTrace:
+    def __init__(self, length: int = 100, sampling: int = 1):
+        """Initialization of the trace of the train - the ring buffer with the last length positions.
+        Only one of every sampling added positions is kept."""
+        self.length = length
+        self.sampling = sampling
+        self.points = array("d", bytes(array("d").itemsize * 2 * length)) # x and y of the positions
+        self.number_of_points = 0
+        self.next_index = 0 # slot for the next position
+        self.number_of_added_points = 0
+
+    def add(self, coord_world: tuple[float, float]):
+        """Add the position to the trace (the oldest one is overwritten)."""
+        if self.length and not self.number_of_added_points % self.sampling:
+            self.points[2 * self.next_index], self.points[2 * self.next_index + 1] = coord_world
+            self.next_index = (self.next_index + 1) % self.length
+            if self.number_of_points < self.length: self.number_of_points += 1
+        self.number_of_added_points += 1
+
+    def get_points(self) -> np.ndarray:
+        """Return positions of the trace from the oldest one as array of shape (n, 2)."""
+        points = np.frombuffer(self.points, float).reshape(-1, 2)
+        if self.number_of_points < self.length:
+            return points[:self.number_of_points].copy()
+        return np.concatenate((points[self.next_index:], points[:self.next_index]))
+
+    def clear(self):
+        """Remove all positions."""
+        self.number_of_points = 0
+        self.next_index = 0
+
+    def draw(self, win, color: tuple[int, int, int], offset_x: int, offset_y: int, scale):
+        """Draw the trace as one polyline as wide as the circles of positions (if it is visible on the screen)."""
+        if self.number_of_points < 2: return
+        points = (self.get_points() + (offset_x, offset_y)) * scale
+        min_x, min_y = points.min(axis=0)
+        max_x, max_y = points.max(axis=0)
+        view_rect = win.get_rect().inflate(40*scale, 40*scale)
+        if not view_rect.colliderect(pygame.Rect(min_x, min_y, max_x - min_x + 1, max_y - min_y + 1)): return
+        pygame.draw.lines(win, color, False, points.tolist(), max(1, int(40*scale)))
+
 
 class Train:
-    def __init__(self, map, id: int, tile_id: int, last_tile_id: int):
-        """Initialization of the train."""
+    def __init__(self, map, id: int, tile_id: int, last_tile_id: int, trace_length: int = 100, trace_sampling: int = 1):
+        """Initialization of the train.
+        The trace keeps trace_length positions, one every trace_sampling ticks."""
 
         # position on the map
         self.id = id
         self.tile_id = tile_id
         self.last_tile_id = last_tile_id
         self.coord_world = map.dict_with_tiles[tile_id].coord_world
+        self.last_coord_world = self.coord_world # position before the last tick
         last_tile_coord_world = map.dict_with_tiles[last_tile_id].coord_world
         self.angle = angle_to_target(last_tile_coord_world, self.coord_world)
+        map.occupy_tile(self.id, self.tile_id)
 
         # movement parameters
         self.state = "stop" # "no_path"
@@ -28,39 +76,93 @@ class Train:
         self.movement_target = [] # main target of the unit movement
         self.movement_whole_path = [] # whole path to the closest target
         self.movement_free_path = [] # free path to the closest target
+        self.path_outdated = True # whole path has to be recalculated
+        self.path_version = 0 # incremented on every change of the free path or targets
 
         self.run_in_loop = False
 
         # labels
         list_with_colors = [BLUE, YELLOW, ORANGE, GREEN, HOTPINK]
         self.color = list_with_colors[random.randint(0, len(list_with_colors) - 1)]
-        self.font_obj = pygame.font.SysFont("arial", 20)
         self.button_array_origin = (5, 30)
         self.button_height = 40
         self.button_width = 40
         self.button_icon_radius = 15
-        self.list_with_trace = []
+        self.trace = TrainTrace(trace_length, trace_sampling)
 
-    def draw(self, win, map, offset_x: int, offset_y: int, scale):
-        """Draw the train on the screen."""
-        coord_screen = world2screen(self.coord_world, offset_x, offset_y, scale)
-        # draw tracks on path
-        for tile_id in self.movement_free_path:
-            pygame.draw.circle(win, self.color, world2screen(map.dict_with_tiles[tile_id].coord_world, offset_x, offset_y, scale), 10*scale)
-        # draw targets
-        for tile_id in self.movement_target:
-            pygame.draw.circle(win, self.color, world2screen(map.dict_with_tiles[tile_id].coord_world, offset_x, offset_y, scale), 30*scale)
-        # draw trace list
-        for coord_track in self.list_with_trace:
-            pygame.draw.circle(win, self.color, world2screen(coord_track, offset_x, offset_y, scale), 20*scale)
+        # cached overlay with the free path and targets
+        self.path_overlay_version = None # path version of the world coordinates
+        self.path_overlay_world = None # (world coordinates of the free path, world coordinates of targets)
+        self.path_overlay_world_box = None # (min_x, min_y, max_x, max_y) of the world coordinates, None if empty
+        self.path_overlay_key = None # (path version, scale, offset_x, offset_y) of the screen coordinates
+        self.path_overlay_screen = None # (screen coordinates of the free path, screen coordinates of targets)
+
+    def draw(self, win, map, offset_x: int, offset_y: int, scale, interpolation: float = 1):
+        """Draw the train on the screen.
+        Interpolation (from 0 to 1) sets the position between the last two ticks."""
+        coord_world = (self.last_coord_world[0] + (self.coord_world[0] - self.last_coord_world[0]) * interpolation, 
+                        self.last_coord_world[1] + (self.coord_world[1] - self.last_coord_world[1]) * interpolation)
+        coord_screen = world2screen(coord_world, offset_x, offset_y, scale)
         # draw train as symbol
         pygame.draw.circle(win, self.color, coord_screen, 40*scale)
         pygame.draw.line(win, BLACK, coord_screen, move_point(coord_screen, 30*scale, self.angle), int(8*scale))
         # draw label
         if scale >= 0.25:
-            text_obj = self.font_obj.render(f"{self.id} {self.state} {self.v_current:.2f} > {self.v_target}", True, self.color, BLACK) #  {self.movement_target} {self.movement_free_path} {self.movement_whole_path}
+            text_obj = text_cache.render(f"{self.id} {self.state} {self.v_current:.2f} > {self.v_target}", 20, self.color, BLACK) #  {self.movement_target} {self.movement_free_path} {self.movement_whole_path}
             win.blit(text_obj, (coord_screen[0] + 15, coord_screen[1] + 10))
 
+    def draw_path(self, win, map, offset_x: int, offset_y: int, scale):
+        """Draw the path and targets of the train on the screen.
+        The path is drawn as one polyline from the cached overlay, only the visible targets are drawn.
+        The overlay is skipped (without calculating its screen coordinates) if its bounding box is off the screen."""
+        # margin for the width of lines and circles
+        view_rect = win.get_rect().inflate(80*scale, 80*scale)
+        self.update_path_overlay_world(map)
+        if self.is_path_overlay_visible(view_rect, offset_x, offset_y, scale):
+            list_with_path_points, list_with_target_points = self.get_path_overlay(map, offset_x, offset_y, scale)
+            # draw tracks on path
+            if len(list_with_path_points) > 1:
+                pygame.draw.lines(win, self.color, False, list_with_path_points, max(1, int(20*scale)))
+            elif len(list_with_path_points):
+                pygame.draw.circle(win, self.color, list_with_path_points[0], 10*scale)
+            # draw targets
+            for coord_screen in list_with_target_points:
+                if view_rect.collidepoint(coord_screen):
+                    pygame.draw.circle(win, self.color, coord_screen, 30*scale)
+
+    def draw_trace(self, win, offset_x: int, offset_y: int, scale):
+        """Draw the trace of the train on the screen."""
+        self.trace.draw(win, self.color, offset_x, offset_y, scale)
+
+    def update_path_overlay_world(self, map):
+        """Cache world coordinates of the tiles of the free path and of the targets with their bounding box
+        (until the path changes)."""
+        if self.path_overlay_version == self.path_version: return
+        self.path_overlay_version = self.path_version
+        self.path_overlay_world = (
+            np.array([map.dict_with_tiles.get_coord_world(tile_id) for tile_id in self.movement_free_path], dtype=float).reshape(-1, 2),
+            np.array([map.dict_with_tiles.get_coord_world(tile_id) for tile_id in self.movement_target], dtype=float).reshape(-1, 2))
+        points = np.concatenate(self.path_overlay_world)
+        self.path_overlay_world_box = (*points.min(axis=0).tolist(), *points.max(axis=0).tolist()) if len(points) else None
+        self.path_overlay_key = None
+
+    def is_path_overlay_visible(self, view_rect, offset_x: int, offset_y: int, scale) -> bool:
+        """Check if the bounding box of the cached overlay collides with the view (given in screen coordinates)."""
+        if self.path_overlay_world_box is None: return False
+        min_x, min_y, max_x, max_y = self.path_overlay_world_box
+        return view_rect.colliderect(pygame.Rect((min_x + offset_x) * scale, (min_y + offset_y) * scale,
+                                                    (max_x - min_x) * scale + 1, (max_y - min_y) * scale + 1))
+
+    def get_path_overlay(self, map, offset_x: int, offset_y: int, scale) -> tuple[list, list]:
+        """Return screen coordinates of the tiles of the free path and of the targets.
+        World coordinates are cached until the path changes, screen coordinates until the view also changes."""
+        self.update_path_overlay_world(map)
+        key = (self.path_version, scale, offset_x, offset_y)
+        if self.path_overlay_key != key:
+            self.path_overlay_key = key
+            self.path_overlay_screen = tuple(((points + (offset_x, offset_y)) * scale).tolist() for points in self.path_overlay_world)
+        return self.path_overlay_screen
+
     def draw_button(self, win, number_on_screen: int):
         """Draw train button."""
         center = (self.button_array_origin[0] + self.button_width // 2, \
@@ -79,22 +181,21 @@ class Train:
                     self.button_array_origin[1] + self.button_height // 2 + self.button_height * number_on_screen)
         pygame.draw.circle(win, LIME, center, self.button_height, 4)
 
-    def is_button_pressed(self, coord_on_screen: tuple[float, float], number_on_screen: int) -> bool:
-        """Return True if train button is pressed."""
+    def get_pressed_button(self, coord_on_screen: tuple[float, float], number_on_screen: int) -> str:
+        """Return the pressed button of the train: "train", "loop" or None.
+        The train is not changed - the loop has to be switched by the caller (as the command of the simulation)."""
         x, y = coord_on_screen
         if self.button_array_origin[0] < x and x < self.button_array_origin[0] + self.button_width and \
                 self.button_array_origin[1] + self.button_height * number_on_screen < y and \
                 y < self.button_array_origin[1] + self.button_height * (number_on_screen + 1):
-            return True
+            return "train"
         
         # loop button
         if self.button_array_origin[0] + self.button_width < x and x < self.button_array_origin[0] + 2 * self.button_width and \
                 self.button_array_origin[1] + self.button_height * number_on_screen < y and \
                 y < self.button_array_origin[1] + self.button_height * (number_on_screen + 1):
-            if self.run_in_loop: self.run_in_loop = False
-            else: self.run_in_loop = True
-            return True
-        return False
+            return "loop"
+        return None
 
     def run(self, map, dict_with_trains):
         """Life-cycle of the train."""
@@ -102,12 +203,38 @@ class Train:
         # check position
         coord_id = map.world2id(self.coord_world)
         current_tile_id = map.get_tile_by_coord_id(coord_id)
+        self.check_position(map, dict_with_trains, current_tile_id)
+
+        # set parameters related to train movement
+        self.set_velocity()
+        self.set_turn_velocity()
+        self.accelerate()
+        self.set_state()
+
+        # move the train
+        coord_steering_target = self.get_steering_target(map)
+        if coord_steering_target is not None:
+            self.angle = self.get_new_angle(coord_steering_target)
+        self.last_coord_world = self.coord_world
+        self.coord_world = move_point(self.coord_world, self.v_current, self.angle)
+
+        # add coordinates to trace
+        self.trace.add(self.coord_world)
+
+    def check_position(self, map, dict_with_trains, current_tile_id: int):
+        """Handle the discrete events related to the position of the train:
+        change of the tile, collisions, achieved targets and tiles of the path."""
         if current_tile_id and current_tile_id != self.tile_id:
+            map.release_tile(self.id, self.tile_id)
+            map.occupy_tile(self.id, current_tile_id)
             self.last_tile_id = self.tile_id
             self.tile_id = current_tile_id
+            # check if the train left the calculated path
+            if len(self.movement_target) and (not len(self.movement_whole_path) or self.movement_whole_path[0] != current_tile_id):
+                self.path_outdated = True
 
         # check collisions
-        self.check_collisions(dict_with_trains)
+        self.check_collisions(map)
 
         # check current movement target
         if len(self.movement_target):
@@ -115,7 +242,9 @@ class Train:
                 last_target = self.movement_target.pop(0) # remove the achieved target
                 if self.run_in_loop:
                     self.movement_target.append(last_target)
-                map.calculate_trains_path(dict_with_trains)
+                self.path_version += 1
+                self.path_outdated = True
+                map.calculate_train_path(self, dict_with_trains)
 
         # check current movement whole path
         if len(self.movement_whole_path):
@@ -126,72 +255,96 @@ class Train:
         if len(self.movement_free_path):
             if self.movement_free_path[0] == current_tile_id:
                 self.movement_free_path.pop(0) # remove the achieved tile
+                self.path_version += 1
 
-        # set parameters related to train movement
-        self.set_velocity()
-        self.set_turn_velocity()
-        self.accelerate()
-        self.set_state()
-
-        # move the train
+    def get_steering_target(self, map):
+        """Return world coordinates of the point the train is heading to 
+        (the next tile of the free path or the next track in emergency).
+        Return None if there is no such point."""
         if len(self.movement_free_path):  
-            self.angle = self.get_new_angle(map.dict_with_tiles[self.movement_free_path[0]].coord_world)
-        else:
-            emergency_next_track_id = map.find_next_track(self.last_tile_id, self.tile_id)
-            if emergency_next_track_id:
-                self.angle = self.get_new_angle(map.dict_with_tiles[emergency_next_track_id].coord_world)
-        self.coord_world = move_point(self.coord_world, self.v_current, self.angle)
+            return map.dict_with_tiles[self.movement_free_path[0]].coord_world
+        emergency_next_track_id = map.find_next_track(self.last_tile_id, self.tile_id)
+        if emergency_next_track_id:
+            return map.dict_with_tiles[emergency_next_track_id].coord_world
+        return None
 
-        # add coordinates to trace list
-        self.list_with_trace.append(self.coord_world)
-        if len(self.list_with_trace) > 100:
-            self.list_with_trace.pop(0)
+    def add_target(self, tile_id: int):
+        """Add new movement target."""
+        self.movement_target.append(tile_id)
+        self.path_outdated = True
+        self.path_version += 1
+
+    def remove_target(self, tile_id: int):
+        """Remove movement target."""
+        if tile_id in self.movement_target:
+            self.movement_target.remove(tile_id)
+            self.path_outdated = True
+            self.path_version += 1
 
     def find_movement_whole_path(self, map):
         """Find the entire route to the current target."""
         if len(self.movement_target):
-            self.movement_whole_path = map.find_route(self.movement_target[0], self.last_tile_id, self.tile_id)
+            self.movement_whole_path = map.find_shortest_route(self.movement_target[0], self.last_tile_id, self.tile_id)
         else:
             self.movement_whole_path = []
+        self.path_outdated = False
 
     def find_movement_free_path(self, map, dict_with_trains, dict_with_reservations):
-        """Select a collision-free start from the found route."""
+        """Select a collision-free start from the found route.
+        The route is checked block by block - the train can enter the block only if it is not occupied
+        or reserved by other trains (in the current block only tiles ahead of the train are checked).
+        The free path ends in front of switches, ends of tracks and semaphores, or at the target."""
 
+        last_free_path = self.movement_free_path
         self.movement_free_path = []
         considered_segment = []
+        current_block_id = map.get_block_id(self.tile_id)
+        last_block_id = current_block_id
 
         # check path
         for tile_id in self.movement_whole_path:
             # check end of segment
-            if len(map.dict_with_tiles[tile_id].list_with_tracks) != 2:
+            if map.is_block_boundary(tile_id):
                 self.movement_free_path += considered_segment
                 considered_segment = []
+            block_id = map.get_block_id(tile_id)
             # check collisions
-            if any((self.id != t_id and dict_with_trains[t_id].tile_id == tile_id) for t_id in dict_with_trains):
-                break
-            # check if the path is not reserved
-            if tile_id not in dict_with_reservations: # path is still free
-                considered_segment.append(tile_id)
-            else:
+            if block_id == current_block_id:
+                if any(t_id != self.id for t_id in map.get_trains_on_tile(tile_id)):
+                    break
+            elif block_id != last_block_id:
+                if any(t_id != self.id for t_id in map.get_trains_in_block(block_id)):
+                    break
+            # check if the block is not reserved
+            if dict_with_reservations.get(block_id, self.id) != self.id:
                 break
+            considered_segment.append(tile_id)
+            last_block_id = block_id
             # add last segment
             if len(self.movement_target) and tile_id == self.movement_target[0]:
                 self.movement_free_path += considered_segment
 
-        # reserve path
-        for tile_id in self.movement_free_path:    
-            dict_with_reservations[tile_id] = self.id
+        if self.movement_free_path != last_free_path:
+            self.path_version += 1
+
+        # reserve blocks of the path
+        last_block_id = None
+        for tile_id in self.movement_free_path:
+            block_id = map.get_block_id(tile_id)
+            if block_id != last_block_id:
+                dict_with_reservations[block_id] = self.id
+                last_block_id = block_id
 
-    def check_collisions(self, dict_with_trains):
+    def check_collisions(self, map):
         """Check collisions with other trains."""
-        for train_id in dict_with_trains:
-            if train_id != self.id and dict_with_trains[train_id].tile_id == self.tile_id:
-                self.state = "broken"
-                self.v_target = 0
-                self.v_current = 0
-                self.movement_free_path = []
-                self.movement_target = []
-                self.color = RED
+        if len(map.get_trains_on_tile(self.tile_id)) > 1:
+            self.state = "broken"
+            self.v_target = 0
+            self.v_current = 0
+            self.movement_free_path = []
+            self.movement_target = []
+            self.path_version += 1
+            self.color = RED
 
     def set_velocity(self):
         """Set target velocity based on distance to target."""
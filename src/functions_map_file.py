@@ -0,0 +1,149 @@
+import sys
+import mmap
+import struct
+import numpy as np
+from array import array
+
+from classes_tiles import *
+
+
+# binary map file (little-endian):
+#   header: magic, version, tile edge length, number of slots, lowest free ID, number of columns
+#   table of columns: name, NumPy type, offset and size of the data in bytes
+#   data of the columns (the slot in the column is the ID of the tile), each aligned to MAP_FILE_ALIGNMENT bytes
+MAP_FILE_MAGIC = b"TRAINMAP"
+MAP_FILE_VERSION = 1
+MAP_FILE_HEADER = struct.Struct("<8sIdQQI")
+MAP_FILE_COLUMN = struct.Struct("<16s4sQQ")
+MAP_FILE_ALIGNMENT = 64
+MAP_FILE_TYPES = {"B": "<u1", "b": "<i1", "h": "<i2", "i": "<i4", "d": "<f8"} # array typecode -> NumPy type
+
+
+def save_map_file(path: str, tile_store: TileStore, tile_edge_length: float, lowest_free_id: int):
+    """Save the tiles to the binary map file (unloaded tiles are saved as existing ones).
+    Columns kept for all tiles are written straight from the store.
+    Columns of the chunks are written chunk by chunk into the slots given by IDs of tiles
+    (chunks written to disk are read one at a time), so the whole map is never gathered in memory."""
+    dict_with_typecodes = {**tile_store.dict_with_columns, **tile_store.dict_with_chunk_columns}
+    list_with_columns = []
+    offset = MAP_FILE_HEADER.size + MAP_FILE_COLUMN.size * len(dict_with_typecodes)
+    for name, typecode in dict_with_typecodes.items():
+        offset += -offset % MAP_FILE_ALIGNMENT
+        size = array(typecode).itemsize * tile_store.capacity
+        list_with_columns.append((name, typecode, offset, size))
+        offset += size
+    file_size = offset
+
+    with open(path, "wb") as file:
+        file.write(MAP_FILE_HEADER.pack(MAP_FILE_MAGIC, MAP_FILE_VERSION, tile_edge_length,
+                                        tile_store.capacity, lowest_free_id, len(list_with_columns)))
+        for name, typecode, offset, size in list_with_columns:
+            file.write(MAP_FILE_COLUMN.pack(name.encode(), MAP_FILE_TYPES[typecode].encode(), offset, size))
+        for name, typecode, offset, size in list_with_columns:
+            if name in tile_store.dict_with_chunk_columns: continue
+            file.seek(offset)
+            column = getattr(tile_store, name)
+            if name == "exists":
+                file.write(column.tobytes().replace(b"\x02", b"\x01"))
+            elif sys.byteorder == "big" and column.itemsize > 1:
+                column = array(typecode, column)
+                column.byteswap()
+                file.write(column)
+            else:
+                file.write(column)
+        # columns of the chunks are filled below (the space of missing values is left with zeros)
+        file.truncate(file_size)
+
+    if not tile_store.capacity: return
+    with open(path, "r+b") as file:
+        with mmap.mmap(file.fileno(), 0) as buffer:
+            dict_with_views = {name: np.frombuffer(buffer, MAP_FILE_TYPES[typecode], tile_store.capacity, offset)
+                                    for name, typecode, offset, size in list_with_columns if name in tile_store.dict_with_chunk_columns}
+            for chunk_columns in tile_store.iter_chunk_columns():
+                tile_ids = np.frombuffer(chunk_columns.tile_ids, np.int32)
+                slots = np.flatnonzero(tile_ids)
+                tile_ids = tile_ids[slots]
+                for name in dict_with_views:
+                    column = getattr(chunk_columns, name)
+                    dict_with_views[name][tile_ids] = np.frombuffer(column, np.dtype(column.typecode))[slots]
+            del dict_with_views
+            buffer.flush()
+
+
+def load_map_file(path: str, chunk_size: int) -> dict:
+    """Load the binary map file.
+    The file is mapped to memory and read with NumPy, without parsing single tiles.
+    Tiles are returned unloaded (with columns of their chunks in memory), the map indexes them chunk by chunk on the first use.
+    Return dictionary with the tile store, tile edge length and the lowest free ID."""
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            magic, version, tile_edge_length, capacity, lowest_free_id, number_of_columns = MAP_FILE_HEADER.unpack_from(buffer)
+            if magic != MAP_FILE_MAGIC:
+                raise ValueError(f"not a map file: {path}")
+            if version != MAP_FILE_VERSION:
+                raise ValueError(f"unsupported version of the map file: {version}")
+
+            tile_store = TileStore(capacity, chunk_size)
+            dict_with_views = {}
+            for index in range(number_of_columns):
+                name, dtype, offset, size = MAP_FILE_COLUMN.unpack_from(buffer, MAP_FILE_HEADER.size + index * MAP_FILE_COLUMN.size)
+                name = name.rstrip(b"\0").decode()
+                dtype = np.dtype(dtype.rstrip(b"\0").decode())
+                dict_with_views[name] = np.frombuffer(buffer, dtype, size // dtype.itemsize, offset)
+            # copy the columns kept for all tiles to the store (columns unknown to the store are skipped, missing ones are left empty)
+            for name, typecode in tile_store.dict_with_columns.items():
+                if name in dict_with_views:
+                    np.frombuffer(getattr(tile_store, name), np.dtype(typecode))[:capacity] = dict_with_views[name]
+
+            # tiles sorted by chunks (stable - in order of IDs) and split into groups
+            tile_ids = np.flatnonzero(dict_with_views["exists"] == 1)
+            chunk_x = dict_with_views["coord_x"][tile_ids].astype(np.int64) // chunk_size
+            chunk_y = dict_with_views["coord_y"][tile_ids].astype(np.int64) // chunk_size
+            order = np.lexsort((chunk_y, chunk_x))
+            chunk_x, chunk_y, tile_ids = chunk_x[order], chunk_y[order], tile_ids[order]
+            starts = np.flatnonzero(np.diff(chunk_x) | np.diff(chunk_y)) + 1
+            starts = [0] + starts.tolist() if len(tile_ids) else []
+            ends = starts[1:] + [len(tile_ids)]
+            lengths = np.array(ends, np.int64) - np.array(starts, np.int64)
+            chunk_index = np.repeat(np.arange(len(starts)), lengths) # number of the chunk of each tile
+
+            # index of coordinates of the chunks - the tile created first (with the lowest ID) keeps the coordinates
+            coord_index = dict_with_views["coord_x"][tile_ids].astype(np.int64) % chunk_size \
+                            + dict_with_views["coord_y"][tile_ids].astype(np.int64) % chunk_size * chunk_size
+            coord_index, first_indices = np.unique(chunk_index * chunk_size**2 + coord_index, return_index=True)
+            coord_tile_ids = np.zeros(len(starts) * chunk_size**2, np.int32)
+            coord_tile_ids[coord_index] = tile_ids[first_indices]
+
+            # copy the columns of the chunks - the tile takes the slot in order of IDs
+            dict_with_chunk_values = {}
+            for name, typecode in tile_store.dict_with_chunk_columns.items():
+                if name in dict_with_views:
+                    dict_with_chunk_values[name] = dict_with_views[name][tile_ids].astype(np.dtype(typecode))
+                else:
+                    dict_with_chunk_values[name] = np.zeros(len(tile_ids), np.dtype(typecode))
+            del dict_with_views
+
+    tile_ids = tile_ids.astype(np.int32)
+    for start, end in zip(starts, ends):
+        chunk_columns = tile_store.create_chunk((int(chunk_x[start]), int(chunk_y[start])))
+        chunk_columns.tile_ids.frombytes(tile_ids[start:end].tobytes())
+        number = chunk_columns.number
+        chunk_columns.coord_tile_ids = array("i", coord_tile_ids[number * chunk_size**2:(number + 1) * chunk_size**2].tobytes())
+        for name, values in dict_with_chunk_values.items():
+            getattr(chunk_columns, name).frombytes(values[start:end].tobytes())
+    chunk_number = np.frombuffer(tile_store.chunk_number, np.int32)
+    chunk_number[tile_ids] = chunk_index
+    slot = np.frombuffer(tile_store.slot, np.int32)
+    slot[tile_ids] = np.arange(len(tile_ids)) - np.repeat(starts, lengths).astype(np.int64)
+    # mark tiles as unloaded
+    exists = np.frombuffer(tile_store.exists, np.uint8)
+    exists[:] = 0
+    exists[tile_ids] = 2
+    del chunk_number, slot, exists
+    tile_store.number_of_tiles = 0
+
+    return {
+        "tile_store": tile_store,
+        "tile_edge_length": tile_edge_length,
+        "lowest_free_id": lowest_free_id,
+    }
@@ -0,0 +1,102 @@
+import heapq
+
+
+# Routes are searched in the contracted routing graph - each chain of tracks between boundaries of blocks
+# (switches, ends of tracks and semaphores) is a single edge weighted by the number of its tiles.
+# The graph is given by the object (the map or the snapshot of its topology) with methods:
+#   get_next_tiles(last_tile_id, current_tile_id) - tiles connected by track to the right, center and left
+#   is_block_boundary(tile_id) - True for switches, ends of tracks, semaphores and tiles without tracks
+#   get_chain_tiles(tile_id) - tiles of the chain of tracks with the tile (not called for the boundaries)
+#   get_route_edge(tile_id, next_tile_id) - the edge starting with the step to the next tile (see create_route_edge)
+#   get_tile_coord_id(tile_id) - ordinal coordinates of the tile
+
+
+def hex_distance(coord_id_1: tuple[int, int], coord_id_2: tuple[int, int]) -> int:
+    """Return the number of steps between two tiles on the hex grid."""
+    # convert ordinal coordinates to axial ones
+    q_1 = coord_id_1[0] - (coord_id_1[1] - (coord_id_1[1] & 1)) // 2
+    q_2 = coord_id_2[0] - (coord_id_2[1] - (coord_id_2[1] & 1)) // 2
+    dq = q_1 - q_2
+    dr = coord_id_1[1] - coord_id_2[1]
+    return (abs(dq) + abs(dr) + abs(dq + dr)) // 2
+
+
+def get_first_next_tile(graph, last_tile_id: int, current_tile_id: int) -> int:
+    """Return the first tile connected by track for the train coming from the last tile (0 if there is none).
+    Tiles inside the chain have at most one such tile."""
+    for next_tile_id in graph.get_next_tiles(last_tile_id, current_tile_id):
+        if next_tile_id: return next_tile_id
+    return 0
+
+
+def create_route_edge(graph, tile_id: int, next_tile_id: int) -> tuple:
+    """Follow the chain of tracks from the tile through the next tile up to the first boundary of blocks
+    (or back to the tile, if the chain is a loop).
+    Return the edge: (end state (last tile, boundary tile) or None if the chain ends without the boundary,
+    number of tiles of the edge)."""
+    last_tile_id, current_tile_id = tile_id, next_tile_id
+    length = 1
+    while current_tile_id != tile_id and not graph.is_block_boundary(current_tile_id):
+        following_tile_id = get_first_next_tile(graph, last_tile_id, current_tile_id)
+        if not following_tile_id: return (None, length)
+        last_tile_id, current_tile_id = current_tile_id, following_tile_id
+        length += 1
+    return ((last_tile_id, current_tile_id), length)
+
+
+def expand_route_edge(graph, tile_id: int, next_tile_id: int, length: int) -> list[int]:
+    """Return IDs of the first length tiles of the edge starting with the step from the tile to the next tile."""
+    list_with_tiles = [next_tile_id]
+    last_tile_id = tile_id
+    while len(list_with_tiles) < length:
+        last_tile_id, next_tile_id = next_tile_id, get_first_next_tile(graph, last_tile_id, next_tile_id)
+        list_with_tiles.append(next_tile_id)
+    return list_with_tiles
+
+
+def search_shortest_route(graph, target_tile_id: int, last_tile_id: int, current_tile_id: int) -> list[int]:
+    """Search for the shortest train route with the A* algorithm in the contracted routing graph.
+    The search runs over directed states (last tile, current tile) at the boundaries of blocks,
+    the target inside the chain is found by expanding only the edges of its chain.
+    Return list of IDs of the next tiles up to the target or empty list if there is no route."""
+    target_coord_id = graph.get_tile_coord_id(target_tile_id)
+    set_with_target_chain = set() if graph.is_block_boundary(target_tile_id) else set(graph.get_chain_tiles(target_tile_id))
+    start_state = (last_tile_id, current_tile_id)
+    dict_with_costs = {start_state: 0}
+    dict_with_parents = {start_state: None} # state -> (parent state, first tile of the edge, length of the edge)
+    # heap elements: (estimated cost, cost, order of insertion, state)
+    heap = [(hex_distance(graph.get_tile_coord_id(current_tile_id), target_coord_id), 0, 0, start_state)]
+    order = 0
+    while heap:
+        _, cost, _, state = heapq.heappop(heap)
+        if cost > dict_with_costs[state]: continue # outdated heap element
+        # check if the target is reached - expand edges back to tiles
+        if state[1] == target_tile_id and state != start_state:
+            list_with_edges = []
+            while state != start_state:
+                parent_state, next_tile_id, length = dict_with_parents[state]
+                list_with_edges.append(expand_route_edge(graph, parent_state[1], next_tile_id, length))
+                state = parent_state
+            return [tile_id for edge in reversed(list_with_edges) for tile_id in edge]
+        # expand the state
+        for next_tile_id in graph.get_next_tiles(*state):
+            if not next_tile_id: continue
+            end_state, length = graph.get_route_edge(state[1], next_tile_id)
+            list_with_next_states = []
+            if next_tile_id in set_with_target_chain:
+                # the edge crosses the target - it can also end at the target
+                list_with_tiles = expand_route_edge(graph, state[1], next_tile_id, length)
+                if target_tile_id in list_with_tiles:
+                    index = list_with_tiles.index(target_tile_id)
+                    list_with_next_states.append(((list_with_tiles[index - 1] if index else state[1], target_tile_id), index + 1))
+            if end_state is not None:
+                list_with_next_states.append((end_state, length))
+            for next_state, next_length in list_with_next_states:
+                next_cost = cost + next_length
+                if next_state in dict_with_costs and dict_with_costs[next_state] <= next_cost: continue
+                dict_with_costs[next_state] = next_cost
+                dict_with_parents[next_state] = (state, next_tile_id, next_length)
+                order += 1
+                estimated_cost = next_cost + hex_distance(graph.get_tile_coord_id(next_state[1]), target_coord_id)
+                heapq.heappush(heap, (estimated_cost, next_cost, order, next_state))
+    return []
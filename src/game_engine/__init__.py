@@ -4,6 +4,10 @@
 
 
 from . import definitions
+from . import fonts
+from . import frame_timer
 from . import functions_math
+from . import functions_math_batch
 from . import scenes
-from . import scenes_features
\ No newline at end of file
+from . import scenes_features
+from . import text_cache
\ No newline at end of file
@@ -0,0 +1,21 @@
+# Python Game Engine
+# By Tomasz Golaszewski
+# under development since 2022
+
+import pygame
+
+
+# fonts shared by the whole process: (name, size) -> Font
+dict_with_fonts = {}
+
+
+def get_font(name: str = "arial", size: int = 20):
+    """Return shared font object.
+    The font (and the font module) is initialized on the first use."""
+    font_obj = dict_with_fonts.get((name, size))
+    if font_obj is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font_obj = pygame.font.SysFont(name, size)
+        dict_with_fonts[(name, size)] = font_obj
+    return font_obj
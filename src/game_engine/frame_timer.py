@@ -0,0 +1,95 @@
+# Python Game Engine
+# By Tomasz Golaszewski
+# under development since 2022
+
+import json
+import time
+from collections import deque
+
+from game_engine.fonts import get_font
+
+
+class FrameTimer:
+    def __init__(self, history: int = 300, overlay_refresh: int = 30):
+        """Initialization of the timer of the phases of frames.
+        Time of each phase is summed up during the frame (e.g. over all simulation ticks of the frame)
+        and kept in the ring buffer with the last history frames.
+        The timer does nothing until it is enabled."""
+        self.enabled = False
+        self.history = history
+        self.overlay_refresh = overlay_refresh # frames between refreshes of the overlay text
+        self.dict_with_buffers = {} # phase -> ring buffer with times of the phase in the last frames (ms)
+        self.dict_with_current_times = {} # phase -> time of the phase in the current frame (ms)
+        self.dict_with_start_times = {} # phase -> start of the running measurement
+        self.list_with_hooks = [] # functions called at the end of each frame - (frame_number, {phase: ms}) -> None
+        self.frame_number = 0
+        self.list_with_overlay_surfaces = []
+
+    def start(self, phase: str):
+        """Start measuring the phase."""
+        if self.enabled:
+            self.dict_with_start_times[phase] = time.perf_counter()
+
+    def stop(self, phase: str):
+        """Stop measuring the phase and add the measured time to the current frame."""
+        if self.enabled and phase in self.dict_with_start_times:
+            elapsed_time = (time.perf_counter() - self.dict_with_start_times.pop(phase)) * 1000
+            self.dict_with_current_times[phase] = self.dict_with_current_times.get(phase, 0) + elapsed_time
+
+    def end_frame(self):
+        """Move times of the current frame to the ring buffers and call the hooks."""
+        if not self.enabled: return
+        self.frame_number += 1
+        for phase in self.dict_with_current_times:
+            if phase not in self.dict_with_buffers:
+                # phases missing in the earlier frames took no time
+                self.dict_with_buffers[phase] = deque([0] * min(self.frame_number - 1, self.history), maxlen=self.history)
+        for phase in self.dict_with_buffers:
+            self.dict_with_buffers[phase].append(self.dict_with_current_times.get(phase, 0))
+        for hook in self.list_with_hooks:
+            hook(self.frame_number, self.dict_with_current_times)
+        self.dict_with_current_times = {}
+
+    def get_stats(self) -> dict:
+        """Return statistics of the phases from the ring buffers: phase -> (p50, p95, max) in ms."""
+        dict_with_stats = {}
+        for phase in self.dict_with_buffers:
+            list_with_times = sorted(self.dict_with_buffers[phase])
+            if not list_with_times: continue
+            dict_with_stats[phase] = (list_with_times[len(list_with_times) // 2],
+                                      list_with_times[min(len(list_with_times) - 1, int(len(list_with_times) * 0.95))],
+                                      list_with_times[-1])
+        return dict_with_stats
+
+    def dump(self, path: str):
+        """Write the ring buffers and their statistics to the JSON file."""
+        with open(path, "w") as file:
+            json.dump({
+                "frames": self.frame_number,
+                "stats": {phase: dict(zip(["p50", "p95", "max"], stats)) for phase, stats in self.get_stats().items()},
+                "buffers": {phase: list(self.dict_with_buffers[phase]) for phase in self.dict_with_buffers},
+            }, file, indent=2)
+
+    def draw(self, win, coord: tuple[int, int] = (10, 40), size: int = 16):
+        """Draw the overlay with p50/p95/max of the phases."""
+        if not self.enabled: return
+        if self.frame_number % self.overlay_refresh == 0 or not self.list_with_overlay_surfaces:
+            font_obj = get_font("consolas", size)
+            list_with_lines = [f"{'PHASE':<16}{'P50':>8}{'P95':>8}{'MAX':>8}"]
+            for phase, (p50, p95, max_time) in self.get_stats().items():
+                list_with_lines.append(f"{phase:<16}{p50:>8.2f}{p95:>8.2f}{max_time:>8.2f}")
+            self.list_with_overlay_surfaces = [font_obj.render(line, True, (255, 255, 255), (0, 0, 0)) for line in list_with_lines]
+        for i, surface in enumerate(self.list_with_overlay_surfaces):
+            win.blit(surface, (coord[0], coord[1] + i * surface.get_height()))
+
+    def clear(self):
+        """Remove all measurements."""
+        self.dict_with_buffers.clear()
+        self.dict_with_current_times.clear()
+        self.dict_with_start_times.clear()
+        self.frame_number = 0
+        self.list_with_overlay_surfaces = []
+
+
+# timer shared by the engine and the game
+frame_timer = FrameTimer()
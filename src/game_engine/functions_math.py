@@ -57,68 +57,11 @@ def angle_to_target(origin: tuple[float, float], target: tuple[float, float]) ->
 
 def turn_to_target_angle(origin_angle: float, target_angle: float, turn_speed: float) -> float:
     """Function that slowly (by turn_speed) changes origin_angle in target_angle_direction.
+    The turn is made in the shorter direction (wrapped difference of angles).
     Return angle in radians - in the range of 0 to 2pi.
     """
-    if abs(target_angle - origin_angle) > turn_speed: # damping:
-
-        origin_quadrant = get_quadrant(origin_angle)
-        target_quadrant = get_quadrant(target_angle)
-
-        if target_quadrant == origin_quadrant:
-            if origin_angle > target_angle:
-                origin_angle -= turn_speed
-            else:
-                origin_angle += turn_speed
-
-        elif target_quadrant == 1:
-            if origin_quadrant == 2: origin_angle -= turn_speed
-            elif origin_quadrant == 4: origin_angle += turn_speed
-            else:
-                if origin_angle > target_angle + math.pi:
-                    origin_angle += turn_speed
-                else:
-                    origin_angle -= turn_speed
-
-        elif target_quadrant == 2:
-            if origin_quadrant == 1: origin_angle += turn_speed
-            elif origin_quadrant == 3: origin_angle -= turn_speed
-            else:
-                if origin_angle > target_angle + math.pi:
-                    origin_angle += turn_speed
-                else:
-                    origin_angle -= turn_speed
-
-        elif target_quadrant == 3:
-            if origin_quadrant == 2: origin_angle += turn_speed
-            elif origin_quadrant == 4: origin_angle -= turn_speed
-            else:
-                if origin_angle > target_angle - math.pi:
-                    origin_angle += turn_speed
-                else:
-                    origin_angle -= turn_speed
-
-        elif target_quadrant == 4:
-            if origin_quadrant == 1: origin_angle -= turn_speed
-            elif origin_quadrant == 3: origin_angle += turn_speed
-            else:
-                if origin_angle > target_angle - math.pi:
-                    origin_angle += turn_speed
-                else:
-                    origin_angle -= turn_speed
-                    
-        else:
-            if origin_angle > target_angle:
-                origin_angle -= turn_speed
-            else:
-                origin_angle += turn_speed
-
-    else:
-        origin_angle = target_angle
-
-    if origin_angle > 2*math.pi: origin_angle -= 2*math.pi
-    elif origin_angle < 0: origin_angle += 2*math.pi
-
-    return origin_angle
+    delta_angle = (target_angle - origin_angle + math.pi) % (2*math.pi) - math.pi
+    return (origin_angle + max(-turn_speed, min(turn_speed, delta_angle))) % (2*math.pi)
 
 def get_quadrant(angle: float) -> int:
     """Return quadrant of the coordinate system."""
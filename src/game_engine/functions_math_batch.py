@@ -0,0 +1,47 @@
+# Python Game Engine
+# By Tomasz Golaszewski
+# under development since 2022
+
+import math
+import numpy as np
+
+
+# batch versions of the functions from functions_math
+# points are arrays of shape (n, 2), angles and distances are arrays of shape (n,)
+# scalars can be used instead of arrays wherever broadcasting allows it
+
+def world2screen_batch(points: np.ndarray, offset_x: float, offset_y: float, scale: float = 1) -> np.ndarray:
+    """Calculate coordinates of points from world coordinate system to screen coordinate system.
+    Return array of coordinates in the screen coordinate system.
+    """
+    return (np.asarray(points, dtype=float) + (offset_x, offset_y)) * scale
+
+def screen2world_batch(points: np.ndarray, offset_x: float, offset_y: float, scale: float = 1) -> np.ndarray:
+    """Calculate coordinates of points from screen coordinate system to world coordinate system.
+    Return array of coordinates in the world coordinate system.
+    """
+    return np.asarray(points, dtype=float) / scale - (offset_x, offset_y)
+
+def move_point_batch(points: np.ndarray, offset, angle) -> np.ndarray:
+    """Function that changes coordinates of points by angles and offsets."""
+    return np.asarray(points, dtype=float) + np.stack([offset * np.cos(angle), offset * np.sin(angle)], axis=-1)
+
+def dist_two_points_batch(points1: np.ndarray, points2: np.ndarray) -> np.ndarray:
+    """Function that calculates distances between two arrays of points."""
+    delta = np.asarray(points1, dtype=float) - np.asarray(points2, dtype=float)
+    return np.hypot(delta[..., 0], delta[..., 1])
+
+def angle_to_target_batch(origins: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Function that calculates angles between two arrays of points.
+    Return angles in radians - in the range of 0 to 2pi.
+    """
+    delta = np.asarray(targets, dtype=float) - np.asarray(origins, dtype=float)
+    return np.arctan2(delta[..., 1], delta[..., 0]) % (2*math.pi)
+
+def turn_to_target_angle_batch(origin_angles: np.ndarray, target_angles: np.ndarray, turn_speeds) -> np.ndarray:
+    """Function that slowly (by turn_speeds) changes origin_angles in target_angles direction.
+    The turn is made in the shorter direction (wrapped difference of angles).
+    Return angles in radians - in the range of 0 to 2pi.
+    """
+    delta_angles = (target_angles - origin_angles + math.pi) % (2*math.pi) - math.pi
+    return (origin_angles + np.clip(delta_angles, -turn_speeds, turn_speeds)) % (2*math.pi)
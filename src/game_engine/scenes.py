@@ -5,12 +5,14 @@
 import pygame
 
 from game_engine.scenes_features import *
+from game_engine.frame_timer import frame_timer
 
 
 class SceneBase:
     def __init__(self):
         """Initialization of the scene."""
         self.next = self
+        self.interpolation = 1 # progress between the last two simulation ticks used for drawing
     
     def process_input(self, events, keys_pressed):
         """
@@ -40,8 +42,20 @@ class SceneBase:
 
 
 def run_game(start_scene = SceneBase, win_width: int = 1260, win_height: int = 700, framerate: int = 60, 
-                    title_bar: str = "Game by Tomasz", path_to_icon=None):
-    """main function - runs the game"""
+                    title_bar: str = "Game by Tomasz", path_to_icon=None, 
+                    ticks_per_second: int = None, max_catch_up_ticks: int = 5, interpolate: bool = False,
+                    frame_timing: bool = False, show_frame_timing: bool = False, frame_timing_file: str = None):
+    """main function - runs the game
+    
+    If ticks_per_second is given, the simulation (update) runs with fixed timestep 
+    independent of the frame rate. When rendering lags, at most max_catch_up_ticks 
+    are run per frame and the remaining time is dropped.
+    If interpolate is True, scene.interpolation holds progress between the last two ticks
+    (from 0 to 1), which can be used to interpolate positions while drawing.
+    If frame_timing is True, phases of each frame are timed by frame_timer.
+    F3 shows/hides the overlay with the timings, F5 dumps them to frame_timing_file
+    (they are also dumped when the game is closed).
+    """
     
     # initialize the pygame
     pygame.init()
@@ -59,15 +73,21 @@ def run_game(start_scene = SceneBase, win_width: int = 1260, win_height: int = 7
     current_frame = 0
     current_fps = 0
     fps_text = DynamicText((50, 20), "FPS: %.2f" % framerate, 20)
+    frame_timer.enabled = frame_timing
+
+    # fixed timestep
+    if ticks_per_second:
+        tick_duration = 1000 / ticks_per_second # ms
+    accumulated_time = 0
 
     # main loop
     while active_scene != None:
         # control fps
-        clock.tick(framerate)
+        elapsed_time = clock.tick(framerate)
         current_frame += 1
         if current_frame == framerate:
             current_frame = 0
-            
+
             # print infos about fps and time
             current_fps = clock.get_fps()
             fps_text.set_text("FPS: %.2f" % current_fps)
@@ -76,6 +96,9 @@ def run_game(start_scene = SceneBase, win_width: int = 1260, win_height: int = 7
             print("FPS: %.2f" % current_fps, end="\t")
             print(f"TIME: {seconds_from_start}s ({minuts_from_start}min)")
         
+        frame_timer.start("frame")
+        frame_timer.start("input")
+
         # event filtering
         keys_pressed = pygame.key.get_pressed()
         filtered_events = []
@@ -90,6 +113,10 @@ def run_game(start_scene = SceneBase, win_width: int = 1260, win_height: int = 7
                     quit_attempt = True
                 elif event.key == pygame.K_F4 and alt_pressed:
                     quit_attempt = True
+                elif event.key == pygame.K_F3 and frame_timing:
+                    show_frame_timing = not show_frame_timing
+                elif event.key == pygame.K_F5 and frame_timing and frame_timing_file is not None:
+                    frame_timer.dump(frame_timing_file)
             
             if quit_attempt:
                 active_scene.terminate()
@@ -98,18 +125,47 @@ def run_game(start_scene = SceneBase, win_width: int = 1260, win_height: int = 7
         
         # handling events, mouse and keyboard
         active_scene.process_input(filtered_events, keys_pressed)
+        frame_timer.stop("input")
 
         # run simulation
-        active_scene.update()
+        frame_timer.start("update")
+        if ticks_per_second:
+            accumulated_time += elapsed_time
+            number_of_ticks = 0
+            while accumulated_time >= tick_duration and number_of_ticks < max_catch_up_ticks \
+                        and active_scene.next is active_scene:
+                active_scene.update()
+                accumulated_time -= tick_duration
+                number_of_ticks += 1
+            # drop the time that can not be caught up
+            if accumulated_time >= tick_duration:
+                accumulated_time %= tick_duration
+            if interpolate:
+                active_scene.interpolation = accumulated_time / tick_duration
+        else:
+            active_scene.update()
+        frame_timer.stop("update")
 
         # draw scene on the screen
+        frame_timer.start("render")
         active_scene.render(win)
+        frame_timer.stop("render")
         
         # jump to next scene (or to self)
         active_scene = active_scene.next
         
-        # draw FPS  
-        fps_text.draw(win)   
+        # draw FPS and timings
+        fps_text.draw(win)
+        if show_frame_timing:
+            frame_timer.draw(win)
 
         # flip the screen
-        pygame.display.flip()
\ No newline at end of file
+        frame_timer.start("flip")
+        pygame.display.flip()
+        frame_timer.stop("flip")
+        frame_timer.stop("frame")
+        frame_timer.end_frame()
+
+    # save timings
+    if frame_timing and frame_timing_file is not None:
+        frame_timer.dump(frame_timing_file)
\ No newline at end of file
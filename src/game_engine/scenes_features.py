@@ -5,12 +5,13 @@
 import pygame
 
 from game_engine.definitions import *
+from game_engine.fonts import get_font
 
 
 class FixText:
     def __init__(self, coord, text="Base Fix Text", size=20, font="arial", color=LIME):
         """Initialization of the text."""
-        font_obj = pygame.font.SysFont(font, size)
+        font_obj = get_font(font, size)
         self.coord = coord #.copy()
         self.text_obj = font_obj.render(text, True, color)
         self.text_rect = self.text_obj.get_rect(center=self.coord)
@@ -24,7 +25,7 @@ class DynamicText(FixText):
     def __init__(self, coord, text="Dynamic Text", size=20, font="arial", color=LIME):
         """Initialization of the text."""
         FixText.__init__(self, coord, text, size, font, color)
-        self.font_obj = pygame.font.SysFont(font, size)
+        self.font_obj = get_font(font, size)
         self.text = text
         self.size = size
         self.font = font
@@ -0,0 +1,65 @@
+# Python Game Engine
+# By Tomasz Golaszewski
+# under development since 2022
+
+from collections import OrderedDict
+
+from game_engine.fonts import get_font
+
+
+class TextCache:
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        """Initialization of the cache of rendered texts.
+        Surfaces are kept until their total size exceeds max_bytes,
+        then the least recently used ones are removed."""
+        self.max_bytes = max_bytes
+        self.dict_with_surfaces = OrderedDict() # (text, font, size, color, background) -> Surface
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, text: str, size: int = 20, color=(255, 255, 255), background=None, font: str = "arial"):
+        """Return surface with the rendered text.
+        The text is rasterized only if it is not in the cache."""
+        key = (text, font, size, tuple(color), None if background is None else tuple(background))
+        surface = self.dict_with_surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.dict_with_surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = get_font(font, size).render(text, True, color, background)
+        self.dict_with_surfaces[key] = surface
+        self.current_bytes += self.get_surface_bytes(surface)
+        # remove the least recently used surfaces
+        while self.current_bytes > self.max_bytes and len(self.dict_with_surfaces) > 1:
+            _, removed_surface = self.dict_with_surfaces.popitem(last=False)
+            self.current_bytes -= self.get_surface_bytes(removed_surface)
+            self.evictions += 1
+        return surface
+
+    def get_surface_bytes(self, surface) -> int:
+        """Return size of the surface in memory."""
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+    def get_stats(self) -> dict:
+        """Return statistics of the cache."""
+        return {
+            "surfaces": len(self.dict_with_surfaces),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        """Remove all surfaces from the cache."""
+        self.dict_with_surfaces.clear()
+        self.current_bytes = 0
+
+
+# cache shared by all labels
+text_cache = TextCache()
@@ -1,3 +1,19 @@
 WIN_WIDTH, WIN_HEIGHT = 1600, 900
 # WIN_WIDTH, WIN_HEIGHT = 1260, 700 # 720
 FRAMERATE = 60
+TICKRATE = 60 # simulation ticks per second (independent of the frame rate)
+MAX_CATCH_UP_TICKS = 5 # max number of ticks run in one frame when rendering lags
+INTERPOLATE_TRAINS = True # interpolate positions of trains between ticks
+FRAME_TIMING = False # time phases of each frame (F3 - overlay with the timings, F5 - dump to FRAME_TIMING_FILE)
+FRAME_TIMING_FILE = "frame_timing.json"
+TRACE_LENGTH = 100 # number of positions in the trace of each train
+TRACE_SAMPLING = 1 # ticks between positions in the trace
+PATH_OVERLAY_MODES = ["all", "selected", "none"] # paths of trains drawn on the map (P - next mode)
+PATH_OVERLAY_MODE = "all"
+USE_FLEET = False # move trains with the vectorized fleet (NumPy) - events as in Train.run, but positions can differ in the last bits
+                  # (NumPy trigonometry), so checksums differ from the per-train mode and logs are replayed in the recorded mode
+MAP_FILE = None # binary map file loaded at the start (None - the default map)
+COMMAND_LOG_FILE = None # file for the log of commands changing the world (None - the log is not written)
+CHUNK_STORAGE_DIRECTORY = None # directory for chunks of the map unloaded to disk (None - all chunks in memory)
+MAX_LOADED_CHUNKS = 256 # max number of chunks kept in memory when the chunk storage is enabled
+ROUTE_WORKERS = 0 # number of processes searching routes of trains (0 - routes are searched in the main process)
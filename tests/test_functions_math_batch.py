@@ -0,0 +1,115 @@
+# Trains 2025 - tests of the batch versions of the math functions
+# By Tomasz Golaszewski
+# 05.2025 -
+
+import math
+import os
+import sys
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from game_engine.functions_math import *
+from game_engine.functions_math_batch import *
+from classes_map import Map
+
+
+NUMBER_OF_POINTS = 1000
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(2025)
+
+
+def random_points(rng, n: int = NUMBER_OF_POINTS, size: float = 10000) -> np.ndarray:
+    return rng.uniform(-size, size, (n, 2))
+
+
+def wrapped_angle_difference(angles1, angles2):
+    """Difference of angles in the range of -pi to pi (0 and 2pi are the same angle)."""
+    return (np.asarray(angles1) - np.asarray(angles2) + math.pi) % (2*math.pi) - math.pi
+
+
+# ----- COORDINATE SYSTEMS ----------------------------------
+
+def test_world2screen_batch(rng):
+    points = random_points(rng)
+    for offset_x, offset_y, scale in [(0, 0, 1), (-350.5, 120, 0.25), (1e4, -3e3, 2)]:
+        expected = [world2screen(point, offset_x, offset_y, scale) for point in points.tolist()]
+        np.testing.assert_allclose(world2screen_batch(points, offset_x, offset_y, scale), expected)
+
+
+def test_screen2world_batch(rng):
+    points = random_points(rng, size=2000)
+    for offset_x, offset_y, scale in [(0, 0, 1), (-350.5, 120, 0.25), (1e4, -3e3, 2)]:
+        expected = [screen2world(point, offset_x, offset_y, scale) for point in points.tolist()]
+        np.testing.assert_allclose(screen2world_batch(points, offset_x, offset_y, scale), expected)
+
+
+# ----- POINTS AND DISTANCES ----------------------------------
+
+def test_move_point_batch(rng):
+    points = random_points(rng)
+    offsets = rng.uniform(-50, 50, NUMBER_OF_POINTS)
+    angles = rng.uniform(-4*math.pi, 4*math.pi, NUMBER_OF_POINTS)
+    expected = [move_point(point, offset, angle) for point, offset, angle in zip(points.tolist(), offsets, angles)]
+    np.testing.assert_allclose(move_point_batch(points, offsets, angles), expected)
+    # scalar offset and angle
+    expected = [move_point(point, 10, 1.5) for point in points.tolist()]
+    np.testing.assert_allclose(move_point_batch(points, 10, 1.5), expected)
+
+
+def test_dist_two_points_batch(rng):
+    points1, points2 = random_points(rng), random_points(rng)
+    expected = [dist_two_points(point1, point2) for point1, point2 in zip(points1.tolist(), points2.tolist())]
+    np.testing.assert_allclose(dist_two_points_batch(points1, points2), expected)
+
+
+# ----- ANGLES ----------------------------------
+
+def test_angle_to_target_batch(rng):
+    origins = random_points(rng)
+    targets = np.concatenate((random_points(rng, NUMBER_OF_POINTS - 8),
+                                # targets on the axes and just below the positive x axis (wrap-around at 0 and 2pi)
+                                origins[-8:] + [(1, 0), (0, 1), (-1, 0), (0, -1), (1, -1e-12), (1, 1e-12), (1e3, -1e-9), (0, 0)]))
+    expected = [angle_to_target(origin, target) for origin, target in zip(origins.tolist(), targets.tolist())]
+    angles = angle_to_target_batch(origins, targets)
+    assert np.all((angles >= 0) & (angles <= 2*math.pi))
+    np.testing.assert_allclose(wrapped_angle_difference(angles, expected), 0, atol=1e-12)
+
+
+def test_turn_to_target_angle_batch(rng):
+    origin_angles = rng.uniform(0, 2*math.pi, NUMBER_OF_POINTS)
+    target_angles = rng.uniform(0, 2*math.pi, NUMBER_OF_POINTS)
+    turn_speeds = rng.uniform(0, 0.5, NUMBER_OF_POINTS)
+    # pairs of angles on both sides of 0 / 2pi - the turn has to go through the wrap-around
+    origin_angles[:4] = [0.05, 2*math.pi - 0.05, 0, 2*math.pi - 1e-9]
+    target_angles[:4] = [2*math.pi - 0.05, 0.05, math.pi, 1e-9]
+    expected = [turn_to_target_angle(origin_angle, target_angle, turn_speed)
+                    for origin_angle, target_angle, turn_speed in zip(origin_angles, target_angles, turn_speeds)]
+    angles = turn_to_target_angle_batch(origin_angles, target_angles, turn_speeds)
+    assert np.all((angles >= 0) & (angles < 2*math.pi))
+    np.testing.assert_allclose(wrapped_angle_difference(angles, expected), 0, atol=1e-12)
+    # the turn never gets further from the target
+    assert np.all(np.abs(wrapped_angle_difference(target_angles, angles)) <= np.abs(wrapped_angle_difference(target_angles, origin_angles)) + 1e-12)
+
+
+# ----- MAP ----------------------------------
+
+def test_world2id_batch(rng):
+    map = Map()
+    points = random_points(rng, 5 * NUMBER_OF_POINTS)
+    expected = [map.world2id(point) for point in points.tolist()]
+    assert map.world2id_batch(points).tolist() == [list(coord_id) for coord_id in expected]
+
+
+def test_world2id_batch_on_tiles():
+    map = Map()
+    list_with_coord_ids = [(x, y) for x in range(-5, 6) for y in range(-5, 6)]
+    points = np.array([map.id2world(coord_id) for coord_id in list_with_coord_ids])
+    assert map.world2id_batch(points).tolist() == [list(map.world2id(point)) for point in points.tolist()]
+    assert map.world2id_batch(points).tolist() == [list(coord_id) for coord_id in list_with_coord_ids]